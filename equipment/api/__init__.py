@@ -0,0 +1,4 @@
+# Scheduler hooks and existing API clients address these as `equipment.api.*`.
+# `equipment/api/` is a package, so they are re-exported from here.
+from equipment.api.rent_invoice import auto_generate_rent_invoices
+from equipment.api.payment_status import update_payment_schedule_status
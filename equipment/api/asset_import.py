@@ -0,0 +1,199 @@
+import json
+import os
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now_datetime, get_datetime, time_diff_in_seconds
+
+from equipment.api.equipment import ASSET_BATCH_SIZE, onboard_assets, parse_asset_rows
+from equipment.utils.instrumentation import instrument
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_STATE_TTL = 24 * 60 * 60
+IMPORT_COUNTERS = ("total", "processed", "created", "skipped", "failed")
+
+
+# Job state lives in a Redis hash (counters updated with HINCRBY, so parallel
+# chunk jobs never overwrite each other) plus a list of per-row errors. Raw
+# pipeline commands are used because RedisWrapper pickles hash values.
+def _state_key(job_id):
+    return frappe.cache().make_key(f"equipment:asset_import:{job_id}")
+
+
+def _errors_key(job_id):
+    return frappe.cache().make_key(f"equipment:asset_import:{job_id}:errors")
+
+
+@frappe.whitelist(methods=["POST"])
+@instrument()
+def start_asset_import(assets=None, file_url=None, batch_size=ASSET_BATCH_SIZE, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Queue an asset onboarding import and return its job id right away
+
+    The payload is either `assets` (JSON array or JSON lines, the same rows as
+    create_assets_with_items), an attached CSV/XLSX `file_url`, or a CSV/XLSX
+    uploaded as `file` with the request. Spreadsheets need a header row with
+    the create_asset_with_item argument names.
+
+    Returns:
+        dict: job_id, total rows and number of chunk jobs
+    """
+    rows = get_import_rows(assets, file_url)
+    if not rows:
+        frappe.throw(_("No rows to import"))
+
+    job_id = frappe.generate_hash(length=12)
+    chunk_size = cint(chunk_size) or IMPORT_CHUNK_SIZE
+    chunks = range(0, len(rows), chunk_size)
+
+    cache = frappe.cache()
+    pipeline = cache.pipeline()
+    pipeline.hset(_state_key(job_id), mapping={
+        "status": "Queued",
+        "owner": frappe.session.user,
+        "queued_at": str(now_datetime()),
+        **dict.fromkeys(IMPORT_COUNTERS, 0),
+        "total": len(rows),
+    })
+    pipeline.expire(_state_key(job_id), IMPORT_STATE_TTL)
+    pipeline.execute()
+
+    for start in chunks:
+        frappe.enqueue(
+            "equipment.api.asset_import.process_import_chunk",
+            queue="long",
+            import_id=job_id,
+            rows=rows[start:start + chunk_size],
+            offset=start,
+            batch_size=cint(batch_size) or ASSET_BATCH_SIZE,
+        )
+
+    frappe.logger().info(f"✅ تم استلام ملف الأصول: {job_id} ({len(rows)} rows, {len(chunks)} chunks)")
+    return {"job_id": job_id, "total": len(rows), "chunks": len(chunks)}
+
+
+def get_import_rows(assets=None, file_url=None):
+    """Rows from a JSON payload, an attached File or a file uploaded with the request"""
+    if assets:
+        return parse_asset_rows(assets)
+
+    if file_url:
+        file_doc = frappe.get_doc("File", {"file_url": file_url})
+        return read_spreadsheet_rows(file_doc.file_name, file_doc.get_content())
+
+    uploaded = frappe.request and frappe.request.files.get("file")
+    if uploaded:
+        return read_spreadsheet_rows(uploaded.filename, uploaded.stream.read())
+    return []
+
+
+def read_spreadsheet_rows(filename, content):
+    """CSV or XLSX content as a list of dicts keyed by the header row"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        from frappe.utils.csvutils import read_csv_content
+        table = read_csv_content(content)
+    elif extension == ".xlsx":
+        from frappe.utils.xlsxutils import read_xlsx_file_from_attached_file
+        table = read_xlsx_file_from_attached_file(fcontent=content)
+    else:
+        frappe.throw(_("Only CSV and XLSX files can be imported"))
+
+    if not table:
+        return []
+    header = [str(column or "").strip() for column in table[0]]
+    return [
+        {column: value for column, value in zip(header, row) if column and value not in (None, "")}
+        for row in table[1:]
+        if any(value not in (None, "") for value in row)
+    ]
+
+
+def process_import_chunk(import_id, rows, offset, batch_size=ASSET_BATCH_SIZE):
+    """Background job: onboard one chunk of an import and report progress after every batch"""
+    # not called job_id, frappe.enqueue reserves that keyword
+    job_id = import_id
+    pipeline = frappe.cache().pipeline()
+    pipeline.hset(_state_key(job_id), "status", "Running")
+    pipeline.hsetnx(_state_key(job_id), "started_at", str(now_datetime()))
+    pipeline.execute()
+
+    reported = 0
+
+    def on_batch(results):
+        nonlocal reported
+        record_import_results(job_id, results[reported:], offset)
+        reported = len(results)
+
+    try:
+        onboard_assets(rows, batch_size, on_batch=on_batch)
+    except Exception as e:
+        frappe.log_error(title=f"Asset import {job_id} chunk at row {offset} failed")
+        record_import_results(job_id, [
+            {"row": idx, "status": "failed", "error": str(e)}
+            for idx in range(reported, len(rows))
+        ], offset)
+
+
+def record_import_results(job_id, results, offset):
+    """Add batch results to the job counters and mark the job finished after its last row"""
+    if not results:
+        return
+
+    state_key, errors_key = _state_key(job_id), _errors_key(job_id)
+    pipeline = frappe.cache().pipeline()
+    pipeline.hincrby(state_key, "processed", len(results))
+    for status in ("created", "skipped", "failed"):
+        count = sum(1 for result in results if result["status"] == status)
+        if count:
+            pipeline.hincrby(state_key, status, count)
+    errors = [dict(result, row=result["row"] + offset) for result in results if result["status"] == "failed"]
+    if errors:
+        pipeline.rpush(errors_key, *[json.dumps(error) for error in errors])
+        pipeline.expire(errors_key, IMPORT_STATE_TTL)
+    pipeline.hget(state_key, "total")
+    processed, *_, total = pipeline.execute()
+
+    if processed >= cint(total):
+        pipeline = frappe.cache().pipeline()
+        pipeline.hset(state_key, mapping={"status": "Finished", "finished_at": str(now_datetime())})
+        pipeline.execute()
+
+
+@frappe.whitelist()
+def get_asset_import_status(job_id, errors_limit=100):
+    """
+    Progress, throughput and per-row errors of an import job
+
+    Args:
+        job_id (str): Id returned by start_asset_import
+        errors_limit (int, optional): Maximum number of row errors returned
+    """
+    pipeline = frappe.cache().pipeline()
+    pipeline.hgetall(_state_key(job_id))
+    pipeline.lrange(_errors_key(job_id), 0, cint(errors_limit) - 1)
+    raw_state, raw_errors = pipeline.execute()
+    if not raw_state:
+        frappe.throw(_("Import job {0} not found").format(job_id), frappe.DoesNotExistError)
+
+    state = {frappe.safe_decode(k): frappe.safe_decode(v) for k, v in raw_state.items()}
+    if state.get("owner") != frappe.session.user and "System Manager" not in frappe.get_roles():
+        frappe.throw(_("Not permitted to view this import job"), frappe.PermissionError)
+
+    counters = {counter: cint(state.get(counter)) for counter in IMPORT_COUNTERS}
+    elapsed = None
+    if state.get("started_at"):
+        elapsed = time_diff_in_seconds(get_datetime(state.get("finished_at")) or now_datetime(),
+                                       get_datetime(state["started_at"]))
+
+    return {
+        "job_id": job_id,
+        "status": state.get("status"),
+        **counters,
+        "progress": round(counters["processed"] * 100 / counters["total"], 1) if counters["total"] else 0,
+        "queued_at": state.get("queued_at"),
+        "started_at": state.get("started_at"),
+        "finished_at": state.get("finished_at"),
+        "rows_per_second": round(counters["processed"] / elapsed, 2) if elapsed else None,
+        "errors": [json.loads(error) for error in raw_errors],
+    }
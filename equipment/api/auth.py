@@ -1,84 +1,95 @@
 import frappe
 from frappe.auth import check_password
-from frappe.utils import now
+from frappe.utils import cint, now
+from frappe.utils.password import get_decrypted_password, set_encrypted_password
 import secrets
 import string
 
+from equipment.utils.cache import get_user_profile, clear_user_cache
+from equipment.utils.instrumentation import instrument
+from equipment.utils.rate_limit import rate_limit, register_failed_login, clear_failed_logins
+
 @frappe.whitelist(allow_guest=True)
-def authenticate_and_generate_api_key(username, password):
+@rate_limit("login", key_arg="username", lockout=True)
+@instrument()
+def authenticate_and_generate_api_key(username, password, rotate_credentials=False):
     """
-    Authenticate user and generate API key for login
-    
+    Authenticate user and return API credentials for login
+
+    Valid credentials already issued to the user are returned as they are, so
+    logging in again does not write the User or invalidate keys held by other
+    devices. New credentials are only generated when the user has none yet or
+    `rotate_credentials` is set.
+
     Args:
         username (str): Username or email of the user
         password (str): User's password
-    
+        rotate_credentials (bool, optional): Issue a new key and secret even if valid ones exist
+
     Returns:
         dict: Response containing success status, message, and API credentials if successful
     """
-    
+
     try:
-        # Step 1: Check if user exists in User doctype
-        user_doc = None
-        
-        # Try to find user by username or email
-        if frappe.db.exists("User", username):
-            user_doc = frappe.get_doc("User", username)
-        elif frappe.db.exists("User", {"email": username}):
-            user_doc = frappe.get_doc("User", {"email": username})
-        else:
+        # Step 1: Find the user by username or email (cached profile)
+        profile = get_user_profile(username)
+        if not profile:
+            # unknown usernames only count against the per-IP bucket
             return {
                 "success": False,
                 "message": "User not found",
                 "error_code": "USER_NOT_FOUND"
             }
-        
+
         # Check if user is enabled
-        if user_doc.enabled == 0:
+        if profile.enabled == 0:
             return {
                 "success": False,
                 "message": "User account is disabled",
                 "error_code": "USER_DISABLED"
             }
-        
+
         # Step 2: Verify password
         try:
-            check_password(user_doc.name, password)
+            check_password(profile.name, password)
         except frappe.AuthenticationError:
+            register_failed_login(profile.name)
             return {
                 "success": False,
                 "message": "Invalid password",
                 "error_code": "INVALID_PASSWORD"
             }
-        
-        # Step 3: Generate API Key and Secret
-        # api_key, api_secret = generate_api_credentials(user_doc.name)
-        api_key, api_secret = generate_api_credentials()
-        # Step 4: Update user document with API credentials
-        user_doc.api_key = api_key
-        user_doc.api_secret = api_secret
-        user_doc.save(ignore_permissions=True)
-        # Log successful authentication
-        frappe.logger().info(f"API credentials generated for user: {user_doc.name}")
-        
+
+        clear_failed_logins(profile.name)
+
+        # Step 3: Reuse the issued credentials, or generate and store new ones
+        api_key = profile.api_key
+        api_secret = None
+        if api_key and not cint(rotate_credentials):
+            api_secret = get_decrypted_password("User", profile.name, "api_secret", raise_exception=False)
+
+        if not (api_key and api_secret):
+            api_key, api_secret = generate_api_credentials()
+            set_api_credentials(profile.name, api_key, api_secret)
+            frappe.logger().info(f"API credentials generated for user: {profile.name}")
+
         return {
             "success": True,
             "message": "Authentication successful",
             "data": {
-                "user": user_doc.name,
-                "full_name": user_doc.full_name,
-                "email": user_doc.email,
+                "user": profile.name,
+                "full_name": profile.full_name,
+                "email": profile.email,
                 "api_key": api_key,
                 "api_secret": api_secret,
                 "generated_at": now(),
                 "sid": frappe.session.sid,
-                "user_id":user_doc.email,
-                "email": user_doc.email,    
-                "user_type": user_doc.user_type,
-                "role":frappe.get_roles(user_doc.email),
+                "user_id": profile.email,
+                "user_type": profile.user_type,
+                "role": profile.roles,
             }
         }
-        
+
     except Exception as e:
         frappe.logger().error(f"Authentication error: {str(e)}")
         return {
@@ -126,8 +137,21 @@ def generate_api_credentials():
     # user_doc.save(ignore_permissions=True)
     
     return api_key, api_secret
-    
+
+
+def set_api_credentials(user, api_key, api_secret):
+    """
+    Store new API credentials without saving the whole User document
+
+    The key is written with a single UPDATE and the secret encrypted into
+    __Auth; the cached login profile of the user is dropped.
+    """
+    frappe.db.set_value("User", user, "api_key", api_key)
+    set_encrypted_password("User", user, api_secret, "api_secret")
+    clear_user_cache(frappe._dict(doctype="User", name=user, email=frappe.db.get_value("User", user, "email")))
+
 @frappe.whitelist()
+@instrument()
 def regenerate_api_key(user=None):
     """
     Regenerate API credentials for current user or specified user
@@ -148,16 +172,12 @@ def regenerate_api_key(user=None):
         frappe.throw("Not permitted to regenerate API key for other users")
     
     try:
-        # Get user document
-        user_doc = frappe.get_doc("User", user)
-        
-        # Generate new credentials
-        api_key, api_secret = generate_api_credentials(user)
-        
-        # Update user document
-        user_doc.api_key = api_key
-        user_doc.api_secret = api_secret
-        user_doc.save(ignore_permissions=True)
+        if not frappe.db.exists("User", user):
+            frappe.throw(f"User {user} not found", frappe.DoesNotExistError)
+
+        # Generate and store new credentials
+        api_key, api_secret = generate_api_credentials()
+        set_api_credentials(user, api_key, api_secret)
         
         return {
             "success": True,
@@ -178,6 +198,7 @@ def regenerate_api_key(user=None):
         }
 
 @frappe.whitelist()
+@instrument()
 def get_user_api_credentials():
     """
     Get current user's API credentials
@@ -208,6 +229,7 @@ def get_user_api_credentials():
 
 # Usage example for API authentication
 @frappe.whitelist(allow_guest=True)
+@rate_limit()
 def api_login_example():
     """
     Example of how to use the generated API credentials for authentication
@@ -0,0 +1,54 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, getdate
+
+from equipment.utils.instrumentation import instrument
+
+
+@frappe.whitelist()
+@instrument()
+def get_free_equipment(from_date, to_date, asset_category=None, location=None, limit=500):
+    """
+    Submitted assets without a submitted lease overlapping [from_date, to_date]
+
+    Args:
+        from_date (str): First day of the booking
+        to_date (str): Last day of the booking
+        asset_category (str, optional): Only assets of this category
+        location (str, optional): Only assets at this location
+        limit (int, optional): Maximum number of assets returned
+
+    Returns:
+        list: name, asset_name, item_code, asset_category and location per asset
+    """
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    if to_date < from_date:
+        frappe.throw(_("To Date cannot be before From Date"))
+
+    conditions = []
+    if asset_category:
+        conditions.append("and asset.asset_category = %(asset_category)s")
+    if location:
+        conditions.append("and asset.location = %(location)s")
+
+    return frappe.db.sql(f"""
+        select asset.name, asset.asset_name, asset.item_code, asset.asset_category, asset.location
+        from `tabAsset` asset
+        where asset.docstatus = 1
+            {" ".join(conditions)}
+            and not exists (
+                select 1 from `tabEquipment Lease Contract` contract
+                where contract.leased_equipment = asset.name
+                    and contract.docstatus = 1
+                    and contract.start_date <= %(to_date)s
+                    and contract.end_date >= %(from_date)s
+            )
+        order by asset.name
+        limit %(limit)s
+    """, {
+        "from_date": from_date,
+        "to_date": to_date,
+        "asset_category": asset_category,
+        "location": location,
+        "limit": cint(limit) or 500,
+    }, as_dict=True)
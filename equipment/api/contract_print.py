@@ -0,0 +1,303 @@
+import os
+import shutil
+import zipfile
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now_datetime
+from frappe.utils.pdf import get_pdf
+
+from equipment.utils.cache import get_cached_lookup
+from equipment.utils.instrumentation import instrument
+
+PRINT_FORMAT = "Equipment Lease Contract"
+PRINT_OUTPUTS = ("pdf", "zip")
+PRINT_CHUNK_SIZE = 50
+PRINT_STATE_TTL = 24 * 60 * 60
+RENDERED_HTML_TTL = 7 * 24 * 60 * 60
+PAGE_BREAK = '<div style="page-break-after: always;"></div>'
+
+
+# Same layout as the asset import job: counters in a Redis hash, updated with
+# HINCRBY from parallel chunk jobs, read through raw pipelines.
+def _state_key(job_id):
+    return frappe.cache().make_key(f"equipment:contract_print:{job_id}")
+
+
+def _errors_key(job_id):
+    return frappe.cache().make_key(f"equipment:contract_print:{job_id}:errors")
+
+
+def _job_dir(job_id):
+    return frappe.get_site_path("private", "equipment_print", job_id)
+
+
+@frappe.whitelist(methods=["POST"])
+@instrument()
+def start_contract_print(contracts=None, filters=None, output="pdf", chunk_size=PRINT_CHUNK_SIZE):
+    """
+    Queue a batch print of lease contracts and return its job id right away
+
+    The contracts are split into chunks rendered by parallel background jobs.
+    The last job to finish merges the chunks into one PDF (`output` = pdf) or
+    a zip with one PDF per contract (`output` = zip) and attaches it as a
+    private File; its URL is returned by get_contract_print_status.
+
+    Args:
+        contracts (list, optional): Contract names (JSON list)
+        filters (dict, optional): Contract filters used when `contracts` is omitted,
+            defaults to all submitted contracts
+        output (str, optional): pdf or zip
+        chunk_size (int, optional): Contracts per background job
+    """
+    frappe.has_permission("Equipment Lease Contract", "print", throw=True)
+    if output not in PRINT_OUTPUTS:
+        frappe.throw(_("Output must be one of {0}").format(", ".join(PRINT_OUTPUTS)))
+
+    if contracts:
+        contracts = frappe.parse_json(contracts)
+        # only contracts the user may read, with user permissions and sharing applied
+        permitted = set(frappe.get_list("Equipment Lease Contract", filters={"name": ["in", contracts]},
+                                        pluck="name", limit_page_length=0))
+        contracts = [contract for contract in contracts if contract in permitted]
+    else:
+        contracts = frappe.get_list("Equipment Lease Contract",
+                                    filters=frappe.parse_json(filters) if filters else {"docstatus": 1},
+                                    pluck="name", order_by="name", limit_page_length=0)
+    if not contracts:
+        frappe.throw(_("No contracts to print"))
+
+    job_id = frappe.generate_hash(length=12)
+    chunk_size = cint(chunk_size) or PRINT_CHUNK_SIZE
+    chunks = range(0, len(contracts), chunk_size)
+
+    pipeline = frappe.cache().pipeline()
+    pipeline.hset(_state_key(job_id), mapping={
+        "status": "Queued",
+        "owner": frappe.session.user,
+        "output": output,
+        "queued_at": str(now_datetime()),
+        "total": len(contracts),
+        "rendered": 0,
+        "failed": 0,
+        "chunks": len(chunks),
+        "chunks_done": 0,
+    })
+    pipeline.expire(_state_key(job_id), PRINT_STATE_TTL)
+    pipeline.execute()
+
+    for chunk_no, start in enumerate(chunks):
+        frappe.enqueue(
+            "equipment.api.contract_print.render_contract_chunk",
+            queue="long",
+            print_id=job_id,
+            contracts=contracts[start:start + chunk_size],
+            chunk_no=chunk_no,
+            output=output,
+        )
+
+    return {"job_id": job_id, "total": len(contracts), "chunks": len(chunks)}
+
+
+def get_print_template(print_format=PRINT_FORMAT):
+    """The print format document and its Jinja template, compiled once per job"""
+    print_format_doc = frappe.get_cached_doc("Print Format", print_format)
+    return print_format_doc, frappe.get_jenv().from_string(print_format_doc.html)
+
+
+def get_contract_html(contract, modified, print_format_doc, template):
+    """
+    Rendered body HTML of one contract
+
+    Cached by the contract and print format `modified` timestamps, so any edit
+    to either renders it again while unchanged contracts are reused across runs.
+    """
+    return get_cached_lookup(
+        "contract_html", f"{contract}:{modified}:{print_format_doc.modified}",
+        lambda: render_contract(contract, template),
+        ttl=RENDERED_HTML_TTL,
+    )
+
+
+def render_contract(contract, template):
+    doc = frappe.get_doc("Equipment Lease Contract", contract)
+    # same hook as the print view, e.g. to resolve clause snapshots
+    doc.run_method("before_print")
+    return template.render(doc=doc)
+
+
+def get_page_html(bodies, print_format_doc):
+    """One printable HTML document holding `bodies`, each starting on a new page"""
+    lang = print_format_doc.default_print_language or "en"
+    direction = "rtl" if lang in ("ar", "fa", "he", "ur") else "ltr"
+    return (
+        f'<!DOCTYPE html><html lang="{lang}" dir="{direction}"><head><meta charset="utf-8">'
+        f"<style>{print_format_doc.css or ''}</style></head>"
+        f"<body>{PAGE_BREAK.join(bodies)}</body></html>"
+    )
+
+
+def get_pdf_options(print_format_doc):
+    return {
+        f"margin-{side}": f"{print_format_doc.get(f'margin_{side}') or 15}mm"
+        for side in ("top", "bottom", "left", "right")
+    }
+
+
+def render_contract_chunk(print_id, contracts, chunk_no, output="pdf"):
+    """
+    Background job: render one chunk of a batch print
+
+    For a merged PDF the whole chunk goes through wkhtmltopdf in one call,
+    otherwise every contract gets its own PDF. Progress is pushed to the
+    job owner after every contract.
+    """
+    job_id = print_id
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    pipeline = frappe.cache().pipeline()
+    pipeline.hset(_state_key(job_id), "status", "Running")
+    pipeline.hsetnx(_state_key(job_id), "started_at", str(now_datetime()))
+    pipeline.execute()
+
+    print_format_doc, template = get_print_template()
+    options = get_pdf_options(print_format_doc)
+    modified = dict(frappe.get_all("Equipment Lease Contract",
+                                   filters={"name": ["in", contracts]},
+                                   fields=["name", "modified"], as_list=True))
+
+    bodies = []
+    for contract in contracts:
+        try:
+            html = get_contract_html(contract, modified.get(contract), print_format_doc, template)
+            if output == "zip":
+                with open(os.path.join(job_dir, f"{contract}.pdf"), "wb") as f:
+                    f.write(get_pdf(get_page_html([html], print_format_doc), options))
+            else:
+                bodies.append(html)
+            record_print_progress(job_id, contract)
+        except Exception as e:
+            frappe.log_error(title=f"Contract print {job_id} failed for {contract}")
+            record_print_progress(job_id, contract, error=str(e))
+
+    try:
+        if bodies:
+            with open(os.path.join(job_dir, f"chunk-{chunk_no:05d}.pdf"), "wb") as f:
+                f.write(get_pdf(get_page_html(bodies, print_format_doc), options))
+    except Exception as e:
+        frappe.log_error(title=f"Contract print {job_id} failed for chunk {chunk_no}")
+        pipeline = frappe.cache().pipeline()
+        pipeline.rpush(_errors_key(job_id), frappe.as_json({"chunk": chunk_no, "contracts": contracts, "error": str(e)}))
+        pipeline.expire(_errors_key(job_id), PRINT_STATE_TTL)
+        pipeline.execute()
+
+    # the last chunk to finish assembles the output, whichever worker ran it
+    pipeline = frappe.cache().pipeline()
+    pipeline.hincrby(_state_key(job_id), "chunks_done", 1)
+    pipeline.hget(_state_key(job_id), "chunks")
+    chunks_done, chunks = pipeline.execute()
+    if chunks_done >= cint(chunks):
+        finish_contract_print(job_id, output)
+
+
+def record_print_progress(job_id, contract, error=None):
+    """Count one contract and publish the progress of the job to its owner"""
+    pipeline = frappe.cache().pipeline()
+    pipeline.hincrby(_state_key(job_id), "failed" if error else "rendered", 1)
+    if error:
+        pipeline.rpush(_errors_key(job_id), frappe.as_json({"contract": contract, "error": error}))
+        pipeline.expire(_errors_key(job_id), PRINT_STATE_TTL)
+    pipeline.hmget(_state_key(job_id), "rendered", "failed", "total")
+    *_, (rendered, failed, total) = pipeline.execute()
+
+    done, total = cint(rendered) + cint(failed), cint(total)
+    frappe.publish_realtime("equipment_contract_print_progress", {
+        "job_id": job_id,
+        "done": done,
+        "total": total,
+        "progress": round(done * 100 / total, 1) if total else 0,
+    }, user=frappe.session.user)
+
+
+def finish_contract_print(job_id, output):
+    """Merge the chunk output into one private File and mark the job finished"""
+    job_dir = _job_dir(job_id)
+    files = sorted(name for name in os.listdir(job_dir) if name.endswith(".pdf"))
+
+    if output == "zip":
+        file_name = f"lease-contracts-{job_id}.zip"
+        with zipfile.ZipFile(os.path.join(job_dir, file_name), "w", zipfile.ZIP_DEFLATED) as archive:
+            for name in files:
+                archive.write(os.path.join(job_dir, name), name)
+    else:
+        try:
+            from pypdf import PdfWriter
+        except ImportError:
+            from PyPDF2 import PdfWriter
+
+        file_name = f"lease-contracts-{job_id}.pdf"
+        writer = PdfWriter()
+        for name in files:
+            writer.append(os.path.join(job_dir, name))
+        with open(os.path.join(job_dir, file_name), "wb") as f:
+            writer.write(f)
+
+    with open(os.path.join(job_dir, file_name), "rb") as f:
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": file_name,
+            "content": f.read(),
+            "is_private": 1,
+        }).insert(ignore_permissions=True)
+    frappe.db.commit()
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+    pipeline = frappe.cache().pipeline()
+    pipeline.hset(_state_key(job_id), mapping={
+        "status": "Finished",
+        "finished_at": str(now_datetime()),
+        "file_url": file_doc.file_url,
+    })
+    pipeline.execute()
+    frappe.publish_realtime("equipment_contract_print_progress", {
+        "job_id": job_id, "progress": 100, "file_url": file_doc.file_url
+    }, user=frappe.session.user)
+
+
+@frappe.whitelist()
+def get_contract_print_status(job_id, errors_limit=100):
+    """
+    Progress, output file and per-contract errors of a batch print job
+
+    Args:
+        job_id (str): Id returned by start_contract_print
+        errors_limit (int, optional): Maximum number of errors returned
+    """
+    pipeline = frappe.cache().pipeline()
+    pipeline.hgetall(_state_key(job_id))
+    pipeline.lrange(_errors_key(job_id), 0, cint(errors_limit) - 1)
+    raw_state, raw_errors = pipeline.execute()
+    if not raw_state:
+        frappe.throw(_("Print job {0} not found").format(job_id), frappe.DoesNotExistError)
+
+    state = {frappe.safe_decode(k): frappe.safe_decode(v) for k, v in raw_state.items()}
+    if state.get("owner") != frappe.session.user and "System Manager" not in frappe.get_roles():
+        frappe.throw(_("Not permitted to view this print job"), frappe.PermissionError)
+
+    total = cint(state.get("total"))
+    done = cint(state.get("rendered")) + cint(state.get("failed"))
+    return {
+        "job_id": job_id,
+        "status": state.get("status"),
+        "output": state.get("output"),
+        "total": total,
+        "rendered": cint(state.get("rendered")),
+        "failed": cint(state.get("failed")),
+        "progress": round(done * 100 / total, 1) if total else 0,
+        "queued_at": state.get("queued_at"),
+        "started_at": state.get("started_at"),
+        "finished_at": state.get("finished_at"),
+        "file_url": state.get("file_url"),
+        "errors": [frappe.parse_json(error) for error in raw_errors],
+    }
@@ -1,23 +1,59 @@
 import frappe
-from frappe.utils import nowdate
-from frappe.exceptions import DoesNotExistError, ValidationError
+from frappe.utils import nowdate, cint
+from frappe.exceptions import ValidationError
+
+from equipment.utils.cache import get_item_projection, get_default_company
+from equipment.utils.instrumentation import instrument
+from equipment.utils.rate_limit import rate_limit
+
+# Fields check_item_exists may return, also the default projection
+ITEM_EXISTS_FIELDS = ("item_name", "item_group", "stock_uom", "asset_category", "is_fixed_asset", "disabled")
+
+ASSET_BATCH_SIZE = 100
+PREFETCH_CHUNK_SIZE = 1000
 
 @frappe.whitelist(allow_guest=True)
-def check_item_exists(item_code: str):
-    """تحقق إذا كان العنصر موجود في النظام"""
+@rate_limit()
+@instrument(label="item_code")
+def check_item_exists(item_code: str, fields=None):
+    """تحقق إذا كان العنصر موجود في النظام
+
+    يرجع الحقول المطلوبة فقط (fields) من ضمن الحقول المسموح بها
+    """
     try:
-        item = frappe.get_doc("Item", item_code)
-        frappe.logger().info(f"✅ العنصر موجود: {item_code}")
-        return {"exists": True, "item": item}
-    except DoesNotExistError:
+        item = get_item_projection(item_code, get_item_fields(fields))
+        if item:
+            frappe.logger().info(f"✅ العنصر موجود: {item_code}")
+            return {"exists": True, "item": item}
         frappe.logger().warning(f"❌ العنصر غير موجود: {item_code}")
         return {"exists": False, "item": None}
     except Exception as e:
         frappe.logger().error(f"⚠️ خطأ أثناء التحقق من العنصر: {str(e)}")
         return {"exists": False, "item": None, "error": str(e)}
+
+
+def get_item_fields(fields=None):
+    """
+    Item fields returned by check_item_exists
+
+    The allowed fields can be changed with the `equipment_item_exists_fields`
+    site config key. Requested fields outside of it are ignored.
+
+    Args:
+        fields (str|list, optional): JSON list or comma separated field names
+
+    Returns:
+        tuple: Field names, always starting with name and item_code
+    """
+    allowed = frappe.conf.get("equipment_item_exists_fields") or ITEM_EXISTS_FIELDS
+    if isinstance(fields, str):
+        fields = frappe.parse_json(fields) if fields.startswith("[") else fields.split(",")
+    requested = [f.strip() for f in fields or allowed if f.strip() in allowed]
+    return tuple(dict.fromkeys(["name", "item_code", *requested]))
     
     
 @frappe.whitelist(allow_guest=False, methods=["POST"])
+@instrument()
 def create_item_if_not_exists(**args):
     """ينشئ Item لو مش موجود"""
     item_code = args['item_code']   
@@ -34,16 +70,7 @@ def create_item_if_not_exists(**args):
             }
 
     try:
-        item = frappe.get_doc({
-            "doctype": "Item",
-            "item_code": item_code,
-            "item_name": item_name,
-            "item_group": item_group,
-            "asset_category": asset_category,
-            "stock_uom":stock_uom,
-            "is_stock_item" : 0,
-            "is_fixed_asset": 1
-        })
+        item = new_item_doc(item_code, item_name, item_group, stock_uom, asset_category)
         item.insert(ignore_permissions=True)
         frappe.db.commit()
         frappe.logger().info(f"✅ تم إنشاء العنصر الجديد: {item_code}")
@@ -63,6 +90,8 @@ def create_item_if_not_exists(**args):
         raise
 
 @frappe.whitelist(allow_guest=True)
+@rate_limit()
+@instrument(label="item_code")
 def create_asset_with_item(asset_name: str, item_code: str, item_name: str, location: str,
                            purchase_date: str = None, available_for_use_date: str = None,   
                            gross_purchase_amount: float = 0.0, supplier: str = "Samy"):
@@ -76,11 +105,11 @@ def create_asset_with_item(asset_name: str, item_code: str, item_name: str, loca
         })
 
 
-        # في حالة كان dict (العنصر موجود مسبقًا)
-        if isinstance(item, dict):
+        # في حالة كان العنصر موجود مسبقًا
+        if item.get("exists"):
             item_doc = item["status"]
         else:  # في حالة تم إنشاء عنصر جديد
-            item_doc = item
+            item_doc = frappe._dict(item)
         existing_asset = frappe.db.exists("Asset", {
             "asset_name": asset_name,
             "item_code": item_code
@@ -88,27 +117,9 @@ def create_asset_with_item(asset_name: str, item_code: str, item_name: str, loca
         
         if existing_asset:
             return {"success": False, "error": f"Asset already exists: {existing_asset}"}
-        # تواريخ
-        if not purchase_date:
-            purchase_date = nowdate()
-        if not available_for_use_date:
-            available_for_use_date = nowdate()
-
         # إنشاء الأصل
-        asset = frappe.get_doc({
-            "doctype": "Asset",
-            "asset_name": asset_name,
-            "item_code": item_doc.item_code,
-            "asset_category": item_doc.asset_category or "Default",
-            "company": frappe.defaults.get_user_default("Company"),
-            "location": location,
-            "purchase_date": purchase_date,
-            "available_for_use_date": available_for_use_date,
-            "gross_purchase_amount": gross_purchase_amount,
-            "asset_owner": "Supplier",
-            "supplier": supplier,
-            "is_existing_asset": 1,
-        })
+        asset = new_asset_doc(asset_name, item_doc, location, purchase_date, available_for_use_date,
+                              gross_purchase_amount, supplier, frappe.defaults.get_user_default("Company"))
         asset.insert(ignore_permissions=True)
         frappe.db.commit()
 
@@ -118,3 +129,158 @@ def create_asset_with_item(asset_name: str, item_code: str, item_name: str, loca
     except Exception as e:
         frappe.logger().error(f"❌ خطأ أثناء إنشاء الأصل: {str(e)}")
         return {"success": False, "error": str(e)}
+
+
+def new_item_doc(item_code, item_name=None, item_group=None, stock_uom=None, asset_category=None):
+    """Item مش متخزن لأصل ثابت"""
+    return frappe.get_doc({
+        "doctype": "Item",
+        "item_code": item_code,
+        "item_name": item_name,
+        "item_group": item_group,
+        "asset_category": asset_category,
+        "stock_uom":stock_uom,
+        "is_stock_item" : 0,
+        "is_fixed_asset": 1
+    })
+
+
+def new_asset_doc(asset_name, item, location, purchase_date=None, available_for_use_date=None,
+                  gross_purchase_amount=0.0, supplier="Samy", company=None):
+    """Asset مش متخزن لعنصر موجود (item فيه item_code و asset_category)"""
+    return frappe.get_doc({
+        "doctype": "Asset",
+        "asset_name": asset_name,
+        "item_code": item.item_code,
+        "asset_category": item.asset_category or "Default",
+        "company": company,
+        "location": location,
+        "purchase_date": purchase_date or nowdate(),
+        "available_for_use_date": available_for_use_date or nowdate(),
+        "gross_purchase_amount": gross_purchase_amount,
+        "asset_owner": "Supplier",
+        "supplier": supplier,
+        "is_existing_asset": 1,
+    })
+
+
+@frappe.whitelist(methods=["POST"])
+@instrument()
+def create_assets_with_items(assets=None, batch_size=ASSET_BATCH_SIZE):
+    """
+    Bulk version of create_asset_with_item
+
+    Args:
+        assets (str|list, optional): List of create_asset_with_item arguments, as a
+            JSON array or JSON lines. When omitted the request body is read as JSON lines.
+        batch_size (int, optional): Rows inserted per commit
+
+    Returns:
+        dict: Totals and one result per row, in payload order
+    """
+    if assets is None and frappe.request:
+        assets = frappe.request.get_data(as_text=True)
+    return onboard_assets(parse_asset_rows(assets), cint(batch_size) or ASSET_BATCH_SIZE)
+
+
+def parse_asset_rows(assets):
+    """Rows from a list, a JSON array string or JSON lines"""
+    if not isinstance(assets, str):
+        return list(assets or [])
+    assets = assets.strip()
+    if assets.startswith("["):
+        return frappe.parse_json(assets)
+    return [frappe.parse_json(line) for line in assets.splitlines() if line.strip()]
+
+
+def get_existing_items(item_codes):
+    """item_code -> {item_code, asset_category} of the Items that already exist"""
+    items = {}
+    for start in range(0, len(item_codes), PREFETCH_CHUNK_SIZE):
+        for item in frappe.get_all("Item",
+                filters={"name": ["in", item_codes[start:start + PREFETCH_CHUNK_SIZE]]},
+                fields=["name", "item_code", "asset_category"]):
+            items[item.name] = item
+    return items
+
+
+def get_existing_assets(item_codes):
+    """(asset_name, item_code) -> Asset name for the Assets of these items"""
+    assets = {}
+    for start in range(0, len(item_codes), PREFETCH_CHUNK_SIZE):
+        for asset in frappe.get_all("Asset",
+                filters={"item_code": ["in", item_codes[start:start + PREFETCH_CHUNK_SIZE]]},
+                fields=["name", "asset_name", "item_code"]):
+            assets[(asset.asset_name, asset.item_code)] = asset.name
+    return assets
+
+
+def onboard_assets(rows, batch_size=ASSET_BATCH_SIZE, on_batch=None):
+    """
+    Create the missing Items and Assets for many rows
+
+    Existing Items and Assets are fetched up front with set queries, rows are
+    inserted in batches with one commit per batch, and a failing row is
+    rolled back alone.
+
+    Args:
+        rows (list): create_asset_with_item arguments per row
+        batch_size (int, optional): Rows per commit
+        on_batch (callable, optional): Called with the results so far after each commit
+
+    Returns:
+        dict: total / created / skipped / failed counts and per-row results
+    """
+    item_codes = list(dict.fromkeys(row.get("item_code") for row in rows if row.get("item_code")))
+    items = get_existing_items(item_codes)
+    assets = get_existing_assets(item_codes)
+    company = get_default_company()
+
+    results = []
+    for start in range(0, len(rows), batch_size):
+        for idx, row in enumerate(rows[start:start + batch_size], start=start):
+            results.append(onboard_asset_row(idx, frappe._dict(row), items, assets, company))
+        frappe.db.commit()
+        if on_batch:
+            on_batch(results)
+
+    summary = {"total": len(rows), "created": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    frappe.logger().info(f"✅ تم رفع الأصول: {summary}")
+    return dict(summary, results=results)
+
+
+def onboard_asset_row(idx, row, items, assets, company):
+    """Create the Item (if needed) and the Asset of one row, updating the prefetched maps"""
+    missing = [f for f in ("asset_name", "item_code", "location") if not row.get(f)]
+    if missing:
+        return {"row": idx, "status": "failed", "error": f"Missing fields: {', '.join(missing)}"}
+
+    existing_asset = assets.get((row.asset_name, row.item_code))
+    if existing_asset:
+        return {"row": idx, "status": "skipped", "asset": existing_asset, "item": row.item_code,
+                "error": f"Asset already exists: {existing_asset}"}
+
+    frappe.db.savepoint("onboard_asset")
+    try:
+        item = items.get(row.item_code)
+        item_created = not item
+        if item_created:
+            item = new_item_doc(row.item_code, row.item_name, row.item_group, row.stock_uom, row.asset_category)
+            item.insert(ignore_permissions=True)
+
+        asset = new_asset_doc(row.asset_name, item, row.location, row.purchase_date,
+                              row.available_for_use_date, row.gross_purchase_amount or 0.0,
+                              row.supplier or "Samy", company)
+        asset.insert(ignore_permissions=True)
+    except Exception as e:
+        frappe.db.rollback(save_point="onboard_asset")
+        frappe.logger().error(f"❌ خطأ أثناء إنشاء الأصل: {row.asset_name}: {str(e)}")
+        return {"row": idx, "status": "failed", "item": row.item_code, "error": str(e)}
+
+    if item_created:
+        items[row.item_code] = frappe._dict(item_code=item.item_code, asset_category=item.asset_category)
+    assets[(row.asset_name, row.item_code)] = asset.name
+    return {"row": idx, "status": "created", "asset": asset.name, "item": item.item_code,
+            "item_created": item_created}
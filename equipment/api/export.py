@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import tempfile
+
+import frappe
+from frappe import _
+from frappe.desk.reportview import get_match_cond
+from frappe.utils import getdate, nowdate
+from frappe.utils.response import json_handler
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from equipment.utils.instrumentation import instrument
+
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "json": "application/json"}
+EXPORT_COLUMNS = (
+    "contract", "lessor", "lessee", "platform", "leased_equipment",
+    "due_date", "amount", "owner_amount", "platform_commission_amount",
+    "status", "invoice", "invoice_status", "posting_date", "grand_total", "outstanding_amount",
+)
+
+
+def get_export_query(from_date=None, to_date=None, lessor=None, status=None):
+    """
+    Query and values of the payment schedule export, ordered by contract and due date
+
+    Limited to the contracts the session user may read: user permissions,
+    sharing and permission query conditions apply as in the list view.
+    """
+    if isinstance(status, str):
+        status = [value.strip() for value in status.split(",") if value.strip()]
+
+    values = {
+        "from_date": getdate(from_date) if from_date else None,
+        "to_date": getdate(to_date) if to_date else None,
+        "lessor": lessor,
+        "status": tuple(status or ()),
+    }
+    conditions = []
+    if values["from_date"]:
+        conditions.append("and detail.due_date >= %(from_date)s")
+    if values["to_date"]:
+        conditions.append("and detail.due_date <= %(to_date)s")
+    if lessor:
+        conditions.append("and contract.lessor = %(lessor)s")
+    if status:
+        conditions.append("and ifnull(invoice.status, detail.status) in %(status)s")
+    match_conditions = get_match_cond("Equipment Lease Contract")
+    if match_conditions:
+        conditions.append(f"""and detail.parent in (
+            select name from `tabEquipment Lease Contract` where docstatus = 1 {match_conditions}
+        )""")
+
+    query = f"""
+        select
+            detail.parent as contract, contract.lessor, contract.lessee, contract.platform,
+            contract.leased_equipment, detail.due_date, detail.amount, detail.owner_amount,
+            detail.platform_commission_amount, detail.status, detail.invoice,
+            invoice.status as invoice_status, invoice.posting_date, invoice.grand_total,
+            invoice.outstanding_amount
+        from `tabEquipment Lease Contract Detail` detail
+        inner join `tabEquipment Lease Contract` contract
+            on contract.name = detail.parent
+        left join `tabSales Invoice` invoice
+            on invoice.name = detail.invoice
+        where detail.parenttype = 'Equipment Lease Contract'
+            and detail.parentfield = 'payment_schedule_table'
+            and contract.docstatus = 1
+            {" ".join(conditions)}
+        order by detail.parent, detail.due_date, detail.idx
+    """
+    return query, values
+
+
+def write_export(out, rows, export_format):
+    """Write rows (tuples in EXPORT_COLUMNS order) to a text stream one at a time"""
+    if export_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+        return
+
+    out.write("[")
+    for idx, row in enumerate(rows):
+        out.write(",\n" if idx else "\n")
+        out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=json_handler))
+    out.write("\n]\n")
+
+
+@frappe.whitelist()
+@instrument()
+def export_payment_schedule(format="csv", from_date=None, to_date=None, lessor=None, status=None):
+    """
+    Download every submitted payment schedule row with its invoice status
+
+    Rows are read through an unbuffered (server-side) cursor and spooled to a
+    temporary file, which is then sent in chunks; neither side holds the
+    result set in memory. The spool is needed because frappe closes the
+    request's database connection before the response body is sent.
+
+    Args:
+        format (str, optional): csv (default) or json
+        from_date (str, optional): First due date to include
+        to_date (str, optional): Last due date to include
+        lessor (str, optional): Only contracts of this Supplier
+        status (str or list, optional): Invoice statuses (comma separated), e.g. Paid,Overdue.
+            Uninvoiced rows have the status Unpaid
+    """
+    frappe.has_permission("Equipment Lease Contract", "export", throw=True)
+    export_format = (format or "csv").lower()
+    if export_format not in EXPORT_FORMATS:
+        frappe.throw(_("Export format must be one of {0}").format(", ".join(EXPORT_FORMATS)))
+
+    query, values = get_export_query(from_date, to_date, lessor, status)
+
+    spool = tempfile.TemporaryFile()
+    out = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    with frappe.db.unbuffered_cursor():
+        write_export(out, frappe.db.sql(query, values, as_iterator=True), export_format)
+    out.flush()
+    spool = out.detach()
+    spool.seek(0)
+
+    filename = f"payment-schedule-{nowdate()}.{export_format}"
+    return Response(
+        wrap_file(frappe.request.environ, spool),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        direct_passthrough=True,
+    )
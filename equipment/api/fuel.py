@@ -0,0 +1,268 @@
+import frappe
+from frappe import _
+from frappe.utils import add_months, flt, get_first_day, get_last_day, now_datetime, today
+
+from equipment.api.telemetry import TELEMETRY_DOCTYPE
+from equipment.utils.cache import get_default_company, get_fuel_expense_settings
+from equipment.utils.instrumentation import instrument
+
+FUEL_DOCTYPE = "Lease Fuel Consumption"
+
+
+def get_fuel_period(period=None):
+    """First and last day of the month holding `period`, defaults to last month"""
+    period = get_first_day(period or add_months(today(), -1))
+    return period, get_last_day(period)
+
+
+def compute_fuel_consumption(period=None):
+    """
+    Rebuild the unposted fuel consumption rows of the lease contracts for one month
+
+    Consecutive readings of the leased asset inside the contract's days of the
+    month are paired with LAG() in one windowed query for the whole fleet.
+    The last reading of the lease before the month seeds each sequence, so
+    what was burnt across the month boundary is counted in this month.
+    Every drop of the fuel level counts as consumption, rises are refuels and
+    are ignored; the odometer increase is the distance. Fuel and odometer are
+    paired separately, so a reading carrying only one of them does not break
+    the sequence of the other. Rows already on a Journal Entry are kept as
+    they are; consumption from readings that arrived after posting is kept
+    in their late_fuel_consumed and reported, not posted.
+
+    Args:
+        period (str, optional): Any day of the month, defaults to last month
+
+    Returns:
+        dict: Number of contracts and fuel consumed in the month, and the
+            posted contracts with late consumption
+    """
+    from_date, to_date = get_fuel_period(period)
+    values = {
+        "period": from_date,
+        "from_date": from_date,
+        "to_date": to_date,
+        "fuel_price": get_fuel_expense_settings()["fuel_price"],
+        "now": now_datetime(),
+        "user": frappe.session.user,
+    }
+
+    frappe.db.sql(f"""
+        delete from `tab{FUEL_DOCTYPE}`
+        where period = %(period)s
+            and ifnull(journal_entry, '') = ''
+    """, values)
+
+    # readings of each contract's leased days in the month, as (contract, measure, value),
+    # each paired with the one before; seed rows only provide that first previous value
+    readings = """
+        select contract, '{measure}' as measure, is_seed, value,
+            lag(value) over (partition by contract order by reading_time) as previous_value
+        from (
+            select contract.name as contract, reading.reading_time, reading.{field} as value, 0 as is_seed
+            from `tabEquipment Lease Contract` contract
+            inner join `tab{doctype}` reading
+                on reading.asset = contract.leased_equipment
+                and reading.reading_time >= greatest(contract.start_date, %(from_date)s)
+                and reading.reading_time < date_add(least(contract.end_date, %(to_date)s), interval 1 day)
+            where contract.docstatus = 1
+                and contract.start_date <= %(to_date)s
+                and contract.end_date >= %(from_date)s
+                and reading.{field} is not null
+            union all
+            select contract.name, seed.reading_time, seed.{field}, 1
+            from `tabEquipment Lease Contract` contract
+            inner join `tab{doctype}` seed
+                on seed.asset = contract.leased_equipment
+                and seed.reading_time = (
+                    select max(previous.reading_time)
+                    from `tab{doctype}` previous
+                    where previous.asset = contract.leased_equipment
+                        and previous.reading_time >= contract.start_date
+                        and previous.reading_time < %(from_date)s
+                        and previous.{field} is not null
+                )
+            where contract.docstatus = 1
+                and contract.start_date < %(from_date)s
+                and contract.end_date >= %(from_date)s
+        ) contract_readings
+    """
+    frappe.db.sql(f"""
+        insert into `tab{FUEL_DOCTYPE}`
+            (name, creation, modified, owner, modified_by, contract, lessor, platform, leased_equipment,
+             period, readings, fuel_consumed, distance, fuel_price, amount)
+        select
+            md5(concat(usage.contract, '|', %(period)s)), %(now)s, %(now)s, %(user)s, %(user)s,
+            usage.contract, contract.lessor, contract.platform, contract.leased_equipment,
+            %(period)s, usage.readings, usage.fuel_consumed, usage.distance,
+            %(fuel_price)s, usage.fuel_consumed * %(fuel_price)s
+        from (
+            select contract,
+                sum(measure = 'fuel') as readings,
+                ifnull(sum(case when measure = 'fuel' then greatest(previous_value - value, 0) end), 0) as fuel_consumed,
+                ifnull(sum(case when measure = 'odometer' then greatest(value - previous_value, 0) end), 0) as distance
+            from (
+                {readings.format(measure='fuel', field='fuel_level', doctype=TELEMETRY_DOCTYPE)}
+                union all
+                {readings.format(measure='odometer', field='odometer_reading', doctype=TELEMETRY_DOCTYPE)}
+            ) paired
+            where is_seed = 0
+            group by contract
+        ) usage
+        inner join `tabEquipment Lease Contract` contract
+            on contract.name = usage.contract
+        where usage.fuel_consumed > 0
+        on duplicate key update
+            late_fuel_consumed = greatest(values(fuel_consumed) - fuel_consumed, 0)
+    """, values)
+
+    contracts, fuel_consumed = frappe.db.sql(f"""
+        select count(*), ifnull(sum(fuel_consumed), 0)
+        from `tab{FUEL_DOCTYPE}`
+        where period = %(period)s
+    """, values)[0]
+    late_contracts = frappe.db.sql_list(f"""
+        select contract
+        from `tab{FUEL_DOCTYPE}`
+        where period = %(period)s
+            and ifnull(journal_entry, '') != ''
+            and late_fuel_consumed > 0
+        order by contract
+    """, values)
+    return {"contracts": contracts, "fuel_consumed": fuel_consumed, "late_contracts": late_contracts}
+
+
+def get_unposted_fuel_groups(period):
+    """(platform, lessor) pairs with unposted fuel expense in the month"""
+    return frappe.db.sql(f"""
+        select distinct ifnull(platform, '') as platform, ifnull(lessor, '') as lessor
+        from `tab{FUEL_DOCTYPE}`
+        where period = %(period)s
+            and ifnull(journal_entry, '') = ''
+            and amount > 0
+        order by platform, lessor
+    """, {"period": period}, as_dict=True)
+
+
+def get_unposted_fuel_rows(period, platform, lessor):
+    """Unposted rows of one lessor and platform in the month, locked until commit"""
+    return frappe.db.sql(f"""
+        select name, contract, leased_equipment, fuel_consumed, amount
+        from `tab{FUEL_DOCTYPE}`
+        where period = %(period)s
+            and ifnull(platform, '') = %(platform)s
+            and ifnull(lessor, '') = %(lessor)s
+            and ifnull(journal_entry, '') = ''
+            and amount > 0
+        order by contract
+        for update
+    """, {"period": period, "platform": platform, "lessor": lessor}, as_dict=True)
+
+
+def create_fuel_journal_entry(period, platform, lessor, rows, accounts):
+    """One Journal Entry for the fuel consumed on all leases of a lessor in the month"""
+    if not lessor:
+        frappe.throw(_("Lease contracts {0} have no Lessor to credit for their fuel").format(
+            ", ".join(row.contract for row in rows)
+        ))
+    amount = flt(sum(row.amount for row in rows), 2)
+    journal_entry = frappe.new_doc("Journal Entry")
+    journal_entry.voucher_type = "Journal Entry"
+    journal_entry.company = platform or get_default_company()
+    journal_entry.posting_date = get_last_day(period)
+    journal_entry.user_remark = _("Fuel consumed in {0} on {1} lease contracts of {2}: {3}").format(
+        period.strftime("%Y-%m"), len(rows), lessor, ", ".join(row.contract for row in rows)
+    )
+    journal_entry.append("accounts", {
+        "account": accounts["fuel_expense_account"],
+        "debit_in_account_currency": amount,
+    })
+    journal_entry.append("accounts", {
+        "account": accounts["lessor_account"],
+        "party_type": "Supplier",
+        "party": lessor,
+        "credit_in_account_currency": amount,
+    })
+    journal_entry.insert(ignore_permissions=True)
+    journal_entry.submit()
+    return journal_entry
+
+
+@frappe.whitelist()
+@instrument()
+def post_fuel_expenses(period=None):
+    """
+    Compute the month's lease fuel consumption and post it to the books
+
+    Scheduled monthly for the previous month. Consumption is posted as one
+    Journal Entry per lessor (and platform company), debiting the default
+    fuel expense account and crediting the lessor (as Supplier party) on
+    the liability to lessor account. Each entry is committed on its own so
+    one failing lessor does not hold back the others. Posted rows are
+    linked to their entry and skipped by reruns; cancelling the entry
+    releases them to be posted again. Posted contracts whose consumption
+    grew from late telemetry are logged and returned as late_contracts.
+
+    Args:
+        period (str, optional): Any day of the month, defaults to last month
+
+    Returns:
+        dict: Contracts and fuel consumed in the month, entries posted and failed
+    """
+    if frappe.session.user != "Administrator":
+        frappe.only_for(("System Manager", "Accounts Manager"))
+
+    period = get_fuel_period(period)[0]
+    accounts = get_fuel_expense_settings()
+    if not accounts["fuel_price"]:
+        frappe.throw(_("Set the Fuel Price in Equipment Settings to post fuel expenses"))
+    if not accounts["fuel_expense_account"]:
+        frappe.throw(_("Set the Default Fuel Expense Account in Equipment Settings to post fuel expenses"))
+    if not accounts["lessor_account"]:
+        frappe.throw(_("Set the Liability To Lessor Account in Equipment Settings to post fuel expenses"))
+
+    result = compute_fuel_consumption(period)
+    frappe.db.commit()
+    if result["late_contracts"]:
+        frappe.logger().warning(
+            f"Fuel expenses of {period} already posted, late telemetry not posted for: "
+            f"{', '.join(result['late_contracts'])}"
+        )
+
+    posted = failed = 0
+    for group in get_unposted_fuel_groups(period):
+        try:
+            rows = get_unposted_fuel_rows(period, group.platform, group.lessor)
+            if not rows:
+                # posted meanwhile by a concurrent run
+                frappe.db.rollback()
+                continue
+            journal_entry = create_fuel_journal_entry(period, group.platform, group.lessor, rows, accounts)
+            link_fuel_journal_entry([row.name for row in rows], journal_entry.name)
+            frappe.db.commit()
+            posted += 1
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f"Fuel expense posting failed for {group.lessor} ({period})")
+            failed += 1
+
+    result.update({"period": period, "journal_entries": posted, "failed": failed})
+    frappe.logger().info(f"Fuel expenses posted: {result}")
+    return result
+
+
+def link_fuel_journal_entry(fuel_rows, journal_entry):
+    if fuel_rows:
+        frappe.db.sql(f"""
+            update `tab{FUEL_DOCTYPE}`
+            set journal_entry = %(journal_entry)s
+            where name in %(names)s
+        """, {"journal_entry": journal_entry, "names": tuple(fuel_rows)})
+
+
+def unlink_fuel_journal_entry(journal_entry):
+    frappe.db.sql(f"""
+        update `tab{FUEL_DOCTYPE}`
+        set journal_entry = null
+        where journal_entry = %(journal_entry)s
+    """, {"journal_entry": journal_entry})
@@ -0,0 +1,74 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate, today
+
+from equipment.utils.geo import covering_cells, haversine_km
+from equipment.utils.instrumentation import instrument
+
+MAX_SEARCH_RADIUS_KM = 2000
+
+
+def get_leases_in_cells(cells, on_date=None):
+    """Submitted leases active on `on_date` whose work location lies in one of the geohash cells"""
+    prefixes = " or ".join(f"contract.geohash like %(cell_{i})s" for i in range(len(cells)))
+    values = {f"cell_{i}": f"{cell}%" for i, cell in enumerate(cells)}
+    values["on_date"] = getdate(on_date or today())
+    return frappe.db.sql(f"""
+        select
+            contract.name, contract.leased_equipment, contract.lessee, contract.lessor,
+            contract.geographical_work_location, contract.latitude, contract.longitude,
+            contract.start_date, contract.end_date
+        from `tabEquipment Lease Contract` contract
+        where ({prefixes})
+            and contract.docstatus = 1
+            and contract.start_date <= %(on_date)s
+            and contract.end_date >= %(on_date)s
+    """, values, as_dict=True)
+
+
+@frappe.whitelist()
+@instrument()
+def get_leases_within_radius(latitude, longitude, radius_km=30, on_date=None, limit=100):
+    """
+    Equipment working within `radius_km` of a site, nearest first
+
+    Args:
+        latitude, longitude (float): The site
+        radius_km (float, optional): Search radius in km
+        on_date (str, optional): Only leases active on this date, defaults to today
+        limit (int, optional): Maximum number of leases returned
+
+    Returns:
+        list: Active leases with their work location and distance_km
+    """
+    latitude, longitude, radius_km = flt(latitude), flt(longitude), flt(radius_km)
+    if not 0 < radius_km <= MAX_SEARCH_RADIUS_KM:
+        frappe.throw(_("Radius must be between 0 and {0} km").format(MAX_SEARCH_RADIUS_KM))
+
+    leases = []
+    for lease in get_leases_in_cells(covering_cells(latitude, longitude, radius_km), on_date):
+        lease.distance_km = round(haversine_km(latitude, longitude, lease.latitude, lease.longitude), 3)
+        if lease.distance_km <= radius_km:
+            leases.append(lease)
+
+    leases.sort(key=lambda lease: lease.distance_km)
+    return leases[:cint(limit) or 100]
+
+
+@frappe.whitelist()
+@instrument()
+def get_nearest_leases(latitude, longitude, limit=10, on_date=None, max_radius_km=500):
+    """
+    The `limit` active leases nearest to a site
+
+    The search radius starts small and doubles until enough leases are found
+    or `max_radius_km` is reached, so dense areas only scan nearby cells.
+    """
+    limit, max_radius_km = cint(limit) or 10, min(flt(max_radius_km), MAX_SEARCH_RADIUS_KM)
+    radius_km = 5.0
+    while True:
+        radius_km = min(radius_km, max_radius_km)
+        leases = get_leases_within_radius(latitude, longitude, radius_km, on_date, limit)
+        if len(leases) >= limit or radius_km >= max_radius_km:
+            return leases
+        radius_km *= 2
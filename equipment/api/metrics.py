@@ -0,0 +1,40 @@
+import frappe
+from werkzeug.wrappers import Response
+
+from equipment.utils.instrumentation import get_metric_totals, reset_metrics
+
+# counter -> (prometheus metric name, help text)
+PROMETHEUS_METRICS = {
+    "calls": ("equipment_calls_total", "Instrumented calls"),
+    "errors": ("equipment_errors_total", "Instrumented calls that raised"),
+    "seconds": ("equipment_call_seconds_total", "Wall time spent in instrumented calls"),
+    "queries": ("equipment_db_queries_total", "Database queries run by instrumented calls"),
+    "query_seconds": ("equipment_db_query_seconds_total", "Time spent in database queries"),
+    "rows": ("equipment_db_rows_total", "Rows returned or affected by database queries"),
+    "cache_hits": ("equipment_cache_hits_total", "Lookup cache hits"),
+    "cache_misses": ("equipment_cache_misses_total", "Lookup cache misses"),
+}
+
+
+@frappe.whitelist()
+def get_metrics(reset=False):
+    """
+    Instrumentation totals in the Prometheus text exposition format
+
+    Args:
+        reset (bool, optional): Clear the totals after reading them
+    """
+    frappe.only_for("System Manager")
+
+    totals = get_metric_totals()
+    lines = []
+    for counter, (metric_name, help_text) in PROMETHEUS_METRICS.items():
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} counter")
+        for endpoint, values in sorted(totals.items()):
+            lines.append(f'{metric_name}{{endpoint="{endpoint}"}} {values[counter]:g}')
+
+    if frappe.utils.cint(reset):
+        reset_metrics()
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
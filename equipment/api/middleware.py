@@ -1,7 +1,12 @@
 import frappe
 from frappe import _    
 
+from equipment.utils.instrumentation import instrument
+from equipment.utils.rate_limit import rate_limit
+
 @frappe.whitelist(allow_guest=True)
+@rate_limit()
+@instrument()
 def get_csrf_token():
     csrf_token = frappe.sessions.get_csrf_token()
     if csrf_token:
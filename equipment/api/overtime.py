@@ -0,0 +1,153 @@
+import frappe
+from frappe import _
+from frappe.utils import add_days, add_months, get_first_day, getdate, now_datetime, today
+
+from equipment.utils.instrumentation import instrument
+
+OVERTIME_DOCTYPE = "Lease Overtime"
+
+
+def get_default_overtime_range():
+    """From the first day of last month up to yesterday, so late timesheets are still picked up"""
+    return get_first_day(add_months(today(), -1)), add_days(today(), -1)
+
+
+@frappe.whitelist()
+@instrument()
+def compute_overtime(from_date=None, to_date=None):
+    """
+    Turn submitted timesheet hours into daily overtime rows of the lease contracts
+
+    Hours are summed per contract per day (by the start of each time log)
+    and compared with the contract's agreed daily hours, for the whole fleet
+    in one INSERT .. SELECT. Unbilled rows of the range are rebuilt, so
+    edited or cancelled timesheets are reflected; rows already on an invoice
+    are left as they are.
+
+    Args:
+        from_date (str, optional): First work day, defaults to the first day of last month
+        to_date (str, optional): Last work day, defaults to yesterday
+
+    Returns:
+        dict: Number of overtime rows and overtime hours in the range
+    """
+    if frappe.session.user != "Administrator":
+        frappe.only_for(("System Manager", "Accounts Manager"))
+
+    default_from, default_to = get_default_overtime_range()
+    values = {
+        "from_date": getdate(from_date or default_from),
+        "to_date": getdate(to_date or default_to),
+        "now": now_datetime(),
+        "user": frappe.session.user,
+    }
+    if values["to_date"] < values["from_date"]:
+        frappe.throw(_("To Date cannot be before From Date"))
+
+    frappe.db.sql(f"""
+        delete from `tab{OVERTIME_DOCTYPE}`
+        where work_date between %(from_date)s and %(to_date)s
+            and ifnull(sales_invoice, '') = ''
+    """, values)
+
+    frappe.db.sql(f"""
+        insert into `tab{OVERTIME_DOCTYPE}`
+            (name, creation, modified, owner, modified_by, contract, leased_equipment, work_date,
+             logged_hours, agreed_hours, overtime_hours, overtime_hourly_rate, amount)
+        select
+            md5(concat(daily.contract, '|', daily.work_date)), %(now)s, %(now)s, %(user)s, %(user)s,
+            daily.contract, contract.leased_equipment, daily.work_date,
+            daily.hours, contract.agreed_daily_working_hours,
+            daily.hours - contract.agreed_daily_working_hours,
+            contract.overtime_hourly_rate,
+            (daily.hours - contract.agreed_daily_working_hours) * contract.overtime_hourly_rate
+        from (
+            select timesheet.related_lease_contract as contract, date(log.from_time) as work_date,
+                sum(log.hours) as hours
+            from `tabTimesheet` timesheet
+            inner join `tabTimesheet Detail` log
+                on log.parent = timesheet.name and log.parenttype = 'Timesheet'
+            where timesheet.docstatus = 1
+                and ifnull(timesheet.related_lease_contract, '') != ''
+                and log.from_time >= %(from_date)s
+                and log.from_time < date_add(%(to_date)s, interval 1 day)
+            group by timesheet.related_lease_contract, date(log.from_time)
+        ) daily
+        inner join `tabEquipment Lease Contract` contract
+            on contract.name = daily.contract
+        where contract.docstatus = 1
+            and contract.agreed_daily_working_hours > 0
+            and daily.work_date between contract.start_date and contract.end_date
+            and daily.hours > contract.agreed_daily_working_hours
+        on duplicate key update name = name
+    """, values)
+
+    rows, hours = frappe.db.sql(f"""
+        select count(*), ifnull(sum(overtime_hours), 0)
+        from `tab{OVERTIME_DOCTYPE}`
+        where work_date between %(from_date)s and %(to_date)s
+    """, values)[0]
+
+    frappe.logger().info(
+        f"Overtime computed for {values['from_date']} .. {values['to_date']}: {rows} contract days, {hours} hours"
+    )
+    return {"rows": rows, "overtime_hours": hours}
+
+
+def get_unbilled_overtime(contract, before):
+    """Overtime rows of `contract` worked before `before` and not invoiced yet, locked until commit"""
+    return frappe.db.sql(f"""
+        select name, work_date, overtime_hours, overtime_hourly_rate, amount
+        from `tab{OVERTIME_DOCTYPE}`
+        where contract = %(contract)s
+            and work_date < %(before)s
+            and ifnull(sales_invoice, '') = ''
+        order by work_date
+        for update
+    """, {"contract": contract, "before": getdate(before)}, as_dict=True)
+
+
+def add_overtime_lines(invoice, contract, due_date, item_code, item_name, income_account, asset=None):
+    """
+    Append the unbilled overtime of a contract to a rent invoice
+
+    One line per overtime rate with the hours as quantity.
+
+    Returns:
+        list: Names of the overtime rows billed, to be linked once the invoice exists
+    """
+    rows = get_unbilled_overtime(contract, due_date)
+    by_rate = {}
+    for row in rows:
+        by_rate.setdefault(row.overtime_hourly_rate, []).append(row)
+
+    for rate, rate_rows in by_rate.items():
+        invoice.append("items", {
+            "item_code": item_code,
+            "item_name": item_name,
+            "description": _("Overtime {0} to {1} ({2})").format(
+                rate_rows[0].work_date, rate_rows[-1].work_date, contract
+            ),
+            "qty": sum(row.overtime_hours for row in rate_rows),
+            "rate": rate,
+            "asset": asset,
+            "income_account": income_account,
+        })
+    return [row.name for row in rows]
+
+
+def link_overtime_invoice(overtime_rows, invoice):
+    if overtime_rows:
+        frappe.db.sql(f"""
+            update `tab{OVERTIME_DOCTYPE}`
+            set sales_invoice = %(invoice)s
+            where name in %(names)s
+        """, {"invoice": invoice, "names": tuple(overtime_rows)})
+
+
+def unlink_overtime_invoice(invoice):
+    frappe.db.sql(f"""
+        update `tab{OVERTIME_DOCTYPE}`
+        set sales_invoice = null
+        where sales_invoice = %(invoice)s
+    """, {"invoice": invoice})
@@ -0,0 +1,107 @@
+import frappe
+from frappe.utils import cint, getdate, now_datetime
+
+from equipment.utils.instrumentation import instrument
+from equipment.utils.revenue import refresh_billed_amounts
+
+# Last time the hourly reconciliation ran, stored in __global defaults
+STATUS_WATERMARK_KEY = "equipment_payment_status_watermark"
+STATUS_SYNC_CHUNK_SIZE = 500
+
+
+def sync_invoice_statuses(invoice_names, chunk_size=STATUS_SYNC_CHUNK_SIZE):
+    """
+    Copy the current Sales Invoice status into the linked payment schedule rows
+
+    Statuses are read with one IN query per chunk of invoices and written with
+    one bulk UPDATE per distinct status, without loading the parent contracts.
+    The revenue summary of the affected contracts is refreshed afterwards.
+
+    Args:
+        invoice_names (list): Sales Invoices whose status may have changed
+        chunk_size (int, optional): Invoices per IN query
+
+    Returns:
+        tuple: (rows checked, rows changed)
+    """
+    invoice_names = sorted(set(filter(None, invoice_names)))
+    checked = changed = 0
+    changed_contracts = set()
+
+    for start in range(0, len(invoice_names), chunk_size):
+        rows = frappe.db.sql("""
+            select detail.name, detail.parent, detail.status, invoice.status as invoice_status
+            from `tabEquipment Lease Contract Detail` detail
+            inner join `tabSales Invoice` invoice on invoice.name = detail.invoice
+            where detail.invoice in %(invoices)s
+        """, {"invoices": tuple(invoice_names[start:start + chunk_size])}, as_dict=True)
+
+        rows_by_status = {}
+        for row in rows:
+            if (row.status or "") != (row.invoice_status or ""):
+                rows_by_status.setdefault(row.invoice_status, []).append(row.name)
+                changed_contracts.add(row.parent)
+
+        for status, names in rows_by_status.items():
+            frappe.db.sql("""
+                update `tabEquipment Lease Contract Detail`
+                set status = %(status)s
+                where name in %(names)s
+            """, {"status": status, "names": tuple(names)})
+            changed += len(names)
+        checked += len(rows)
+
+    refresh_billed_amounts(changed_contracts)
+    return checked, changed
+
+
+def get_invoices_modified_since(watermark=None):
+    """
+    Invoices linked to a payment schedule row and changed since `watermark` (all when None)
+
+    Besides the invoices modified since then, this includes the unpaid ones
+    that fell due since the day before: ERPNext's daily overdue job sets
+    their status with a direct update, which neither fires doc_events nor
+    reliably bumps `modified`.
+    """
+    changed = """
+        and (
+            invoice.modified >= %(watermark)s
+            or (invoice.docstatus = 1
+                and invoice.outstanding_amount > 0
+                and invoice.due_date >= date(%(watermark)s) - interval 1 day
+                and invoice.due_date < %(today)s)
+        )
+    """ if watermark else ""
+    return frappe.db.sql_list(f"""
+        select invoice.name
+        from `tabSales Invoice` invoice
+        where exists (
+                select 1 from `tabEquipment Lease Contract Detail` detail
+                where detail.invoice = invoice.name
+            )
+            {changed}
+    """, {"watermark": watermark, "today": getdate()})
+
+
+@frappe.whitelist()
+@instrument()
+def update_payment_schedule_status(full=False):
+    """
+    Hourly reconciliation for status changes the doc_event hooks did not see
+
+    Only invoices modified or fallen due since the previous run are checked,
+    unless `full` is set, which re-checks every invoiced schedule row.
+    """
+    started = now_datetime()
+    watermark = None if cint(full) else frappe.db.get_global(STATUS_WATERMARK_KEY)
+
+    invoice_names = get_invoices_modified_since(watermark)
+    checked, changed = sync_invoice_statuses(invoice_names)
+
+    frappe.db.set_global(STATUS_WATERMARK_KEY, str(started))
+    frappe.logger().info(
+        f"Payment schedule status reconciled: {len(invoice_names)} invoices modified since "
+        f"{watermark or 'the beginning'}, {checked} rows checked, {changed} rows changed"
+    )
+    return {"invoices": len(invoice_names), "checked": checked, "changed": changed}
@@ -0,0 +1,273 @@
+import time
+
+import frappe
+from frappe.utils import today, getdate ,add_days, cint
+
+from equipment.utils.cache import get_item_name, get_invoice_accounts, get_default_company
+from equipment.utils.instrumentation import instrument
+from equipment.utils.revenue import refresh_billed_amounts
+from equipment.api.overtime import compute_overtime, add_overtime_lines, link_overtime_invoice
+from equipment.equipment.doctype.equipment_lease_contract.equipment_lease_contract import materialize_due_periods
+
+DEFAULT_INVOICE_BATCH_SIZE = 100
+
+
+def get_due_payments(as_of=None, payment_names=None, for_update=False):
+    """
+    Collect the payment schedule rows that are due and not invoiced yet
+
+    Runs a single query over `tabEquipment Lease Contract Detail` joined to the
+    submitted parent contract instead of loading every contract document.
+
+    Args:
+        as_of (str, optional): Cut-off due date, defaults to today
+        payment_names (list, optional): Restrict the plan to these schedule rows
+        for_update (bool, optional): Lock the returned rows until commit
+
+    Returns:
+        dict: contract name -> list of due rows ordered by due date
+    """
+    values = {"as_of": getdate(as_of or today()), "payment_names": tuple(payment_names or ())}
+    rows = frappe.db.sql(f"""
+        select
+            detail.name, detail.parent as contract, detail.due_date,
+            detail.amount, detail.owner_amount, detail.platform_commission_amount,
+            contract.lessee, contract.rent_item, contract.leased_equipment,
+            contract.platform
+        from `tabEquipment Lease Contract Detail` detail
+        inner join `tabEquipment Lease Contract` contract
+            on contract.name = detail.parent
+        where detail.parenttype = 'Equipment Lease Contract'
+            and detail.parentfield = 'payment_schedule_table'
+            and detail.due_date <= %(as_of)s
+            and (detail.invoice is null or detail.invoice = '')
+            and contract.docstatus = 1
+            {"and detail.name in %(payment_names)s" if payment_names else ""}
+        order by detail.parent, detail.due_date, detail.idx
+        {"for update" if for_update else ""}
+    """, values, as_dict=True)
+
+    due_payments = {}
+    for row in rows:
+        due_payments.setdefault(row.contract, []).append(row)
+    return due_payments
+
+
+@frappe.whitelist()
+@instrument()
+def auto_generate_rent_invoices():
+    """
+    Split the due payments into chunks and enqueue one invoicing job per chunk
+
+    Batch size and queue come from Equipment Settings. Every chunk commits on
+    its own, so a failing chunk does not roll back the rest of the run.
+    """
+    settings = frappe.get_cached_doc("Equipment Settings")
+    batch_size = cint(settings.get("invoice_batch_size")) or DEFAULT_INVOICE_BATCH_SIZE
+    queue = settings.get("invoice_queue") or "long"
+
+    # compact contracts only get their schedule rows once the period is due
+    materialize_due_periods()
+    # overtime worked so far is billed on the same invoices
+    compute_overtime()
+    frappe.db.commit()
+
+    payment_names = [
+        payment.name
+        for payments in get_due_payments().values()
+        for payment in payments
+    ]
+
+    for start in range(0, len(payment_names), batch_size):
+        frappe.enqueue(
+            "equipment.api.rent_invoice.process_due_payments",
+            queue=queue,
+            payment_names=payment_names[start:start + batch_size],
+            chunk_no=start // batch_size + 1,
+        )
+
+    bill_closing_overtime()
+
+    frappe.logger().info(
+        f"Rent invoicing: {len(payment_names)} due payments enqueued "
+        f"in chunks of {batch_size} on queue '{queue}'"
+    )
+
+
+@instrument(label="chunk_no")
+def process_due_payments(payment_names, chunk_no=None):
+    """
+    Invoice one chunk of due payments and commit it
+
+    The rows are re-planned and locked first, so rows invoiced by an earlier
+    (possibly crashed) run are skipped and re-running the job is idempotent.
+
+    Args:
+        payment_names (list): Payment schedule rows of this chunk
+        chunk_no (int, optional): Chunk number, used for logging only
+
+    Returns:
+        dict: Invoiced / failed / skipped counts and throughput of the chunk
+    """
+    started = time.monotonic()
+    due_payments = get_due_payments(payment_names=payment_names, for_update=True)
+
+    invoiced = failed = 0
+    for contract, payments in due_payments.items():
+        for payment in payments:
+            frappe.db.savepoint("rent_invoice")
+            try:
+                create_rent_invoice(
+                    lessee=payment.lessee,
+                    rent_item=payment.rent_item,
+                    owner_amount=payment.owner_amount,
+                    platform_commission_amount=payment.platform_commission_amount,
+                    platform_commission_item="Platform Commission Income",
+                    contract=payment,
+                    payment=payment
+                )
+                invoiced += 1
+            except Exception:
+                frappe.db.rollback(save_point="rent_invoice")
+                frappe.log_error(title=f"Rent invoice failed for {contract} ({payment.name})")
+                failed += 1
+
+    refresh_billed_amounts(due_payments.keys())
+    frappe.db.commit()
+
+    elapsed = time.monotonic() - started
+    result = {
+        "chunk": chunk_no,
+        "invoiced": invoiced,
+        "failed": failed,
+        "skipped": len(payment_names) - invoiced - failed,
+        "seconds": round(elapsed, 3),
+        "invoices_per_second": round(invoiced / elapsed, 2) if elapsed else None,
+    }
+    frappe.logger().info(f"Rent invoicing chunk finished: {result}")
+    return result
+
+def get_closing_overtime_contracts(as_of=None):
+    """
+    Ended contracts with unbilled overtime and no rent left to invoice
+
+    Overtime is billed with the next rent invoice due after the work day;
+    overtime worked after the last due date has no such invoice.
+    """
+    return frappe.db.sql("""
+        select contract.name, contract.lessee, contract.rent_item, contract.leased_equipment,
+            contract.platform, contract.end_date
+        from `tabEquipment Lease Contract` contract
+        where contract.docstatus = 1
+            and contract.end_date < %(as_of)s
+            and exists (
+                select 1 from `tabLease Overtime` overtime
+                where overtime.contract = contract.name
+                    and ifnull(overtime.sales_invoice, '') = ''
+            )
+            and not exists (
+                select 1 from `tabEquipment Lease Contract Detail` detail
+                where detail.parent = contract.name
+                    and detail.parenttype = 'Equipment Lease Contract'
+                    and detail.parentfield = 'payment_schedule_table'
+                    and ifnull(detail.invoice, '') = ''
+            )
+        order by contract.name
+    """, {"as_of": getdate(as_of or today())}, as_dict=True)
+
+
+def bill_closing_overtime(as_of=None):
+    """
+    Bill the remaining overtime of ended contracts on a final overtime-only invoice
+
+    Returns:
+        int: Number of invoices created
+    """
+    invoiced = 0
+    for contract in get_closing_overtime_contracts(as_of):
+        frappe.db.savepoint("overtime_invoice")
+        try:
+            if create_overtime_invoice(contract):
+                invoiced += 1
+        except Exception:
+            frappe.db.rollback(save_point="overtime_invoice")
+            frappe.log_error(title=f"Closing overtime invoice failed for {contract.name}")
+    frappe.db.commit()
+    return invoiced
+
+
+def create_overtime_invoice(contract):
+    accounts = get_invoice_accounts()
+    invoice = frappe.new_doc("Sales Invoice")
+    invoice.customer = contract.lessee
+    invoice.company = contract.get("platform") or get_default_company()
+    invoice.posting_date = today()
+    invoice.due_date = add_days(today(), 1)
+
+    overtime_rows = add_overtime_lines(
+        invoice, contract.name, add_days(contract.end_date, 1),
+        item_code=contract.rent_item,
+        item_name=get_item_name(contract.rent_item),
+        income_account=accounts["owner_income_account"],
+        asset=contract.leased_equipment,
+    )
+    if not overtime_rows:
+        # billed meanwhile by a rent invoice
+        return None
+
+    invoice.insert(ignore_permissions=True)
+    invoice.submit()
+    link_overtime_invoice(overtime_rows, invoice.name)
+    return invoice
+
+def create_rent_invoice(lessee, rent_item, owner_amount, platform_commission_amount, platform_commission_item, contract, payment):
+    accounts = get_invoice_accounts()
+    invoice = frappe.new_doc("Sales Invoice")
+    invoice.customer = lessee
+    invoice.company = contract.get("platform") or get_default_company()
+    invoice.posting_date = payment.due_date
+    add_due_date = add_days(getdate(payment.due_date), 1)
+    invoice.due_date = add_due_date
+
+    invoice.set_posting_time = 1
+    invoice.posting_time = "00:00:00"
+
+    invoice.append("items", {
+        "item_code": rent_item,
+        "item_name": get_item_name(rent_item),
+        "qty": 1,
+        "rate": owner_amount,
+        "asset": contract.leased_equipment ,
+        "income_account": accounts["owner_income_account"]
+    })
+    invoice.append("items", {
+        "item_code": platform_commission_item,
+        "item_name": get_item_name(platform_commission_item),
+        "qty": 1,
+        "rate": platform_commission_amount,
+        "asset": contract.leased_equipment ,
+        "income_account": accounts["commission_income_account"]
+    })
+    overtime_rows = add_overtime_lines(
+        invoice, payment.contract, payment.due_date,
+        item_code=rent_item,
+        item_name=get_item_name(rent_item),
+        income_account=accounts["owner_income_account"],
+        asset=contract.leased_equipment,
+    )
+
+    invoice.update({
+        # "custom_equipment_lease_contract": contract.name,
+        "asset": contract.leased_equipment
+    })
+    invoice.insert(ignore_permissions=True)
+    invoice.submit()
+
+    # write the link straight to the schedule row, the parent contract is not re-saved.
+    # The status is set here as well: the invoice on_submit hook ran before the link existed
+    payment.invoice = invoice.name
+    payment.status = invoice.status
+    frappe.db.set_value("Equipment Lease Contract Detail", payment.name,
+                        {"invoice": invoice.name, "status": invoice.status}, update_modified=False)
+    link_overtime_invoice(overtime_rows, invoice.name)
+    return invoice
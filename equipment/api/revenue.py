@@ -0,0 +1,97 @@
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from equipment.utils.instrumentation import instrument
+from equipment.utils.revenue import SUMMARY_DOCTYPE, get_period, rebuild_revenue_summary
+
+GROUP_BY_FIELDS = ("period", "lessor", "lessee", "leased_equipment", "platform")
+AMOUNT_FIELDS = ("lease_amount", "owner_amount", "platform_commission_amount", "invoiced_amount", "paid_amount")
+
+
+@frappe.whitelist()
+@instrument()
+def get_revenue_summary(group_by="period", from_date=None, to_date=None, lessor=None, lessee=None,
+                        leased_equipment=None, platform=None, limit=1000):
+    """
+    Lease, commission, invoiced and paid totals read from the Lease Revenue Summary
+
+    Args:
+        group_by (str or list, optional): One or more of period, lessor, lessee,
+            leased_equipment and platform (comma separated), defaults to period
+        from_date (str, optional): First month to include
+        to_date (str, optional): Last month to include
+        lessor, lessee, leased_equipment, platform (str, optional): Filters
+        limit (int, optional): Maximum number of rows returned
+
+    Returns:
+        list: One row per group with the grouped fields and the summed amounts
+    """
+    frappe.has_permission(SUMMARY_DOCTYPE, "read", throw=True)
+
+    if isinstance(group_by, str):
+        group_by = [field.strip() for field in group_by.split(",") if field.strip()]
+    invalid = [field for field in group_by if field not in GROUP_BY_FIELDS]
+    if invalid or not group_by:
+        frappe.throw(_("Group By must be one or more of {0}").format(", ".join(GROUP_BY_FIELDS)))
+
+    filters = {
+        "from_date": get_period(from_date) if from_date else None,
+        "to_date": get_period(to_date) if to_date else None,
+        "lessor": lessor,
+        "lessee": lessee,
+        "leased_equipment": leased_equipment,
+        "platform": platform,
+        "limit": cint(limit) or 1000,
+    }
+    conditions = []
+    if filters["from_date"]:
+        conditions.append("and period >= %(from_date)s")
+    if filters["to_date"]:
+        conditions.append("and period <= %(to_date)s")
+    for field in ("lessor", "lessee", "leased_equipment", "platform"):
+        if filters[field]:
+            conditions.append(f"and {field} = %({field})s")
+
+    columns = ", ".join(group_by)
+    return frappe.db.sql(f"""
+        select {columns}, {", ".join(f"sum({field}) as {field}" for field in AMOUNT_FIELDS)}
+        from `tab{SUMMARY_DOCTYPE}`
+        where 1 = 1
+            {" ".join(conditions)}
+        group by {columns}
+        order by {columns}
+        limit %(limit)s
+    """, filters, as_dict=True)
+
+
+@frappe.whitelist()
+@instrument()
+def get_revenue_totals(from_date=None, to_date=None, platform=None):
+    """Grand totals for the dashboard cards, optionally for one platform company"""
+    frappe.has_permission(SUMMARY_DOCTYPE, "read", throw=True)
+
+    values = {
+        "from_date": get_period(from_date) if from_date else None,
+        "to_date": get_period(to_date) if to_date else None,
+        "platform": platform,
+    }
+    totals = frappe.db.sql(f"""
+        select {", ".join(f"ifnull(sum({field}), 0) as {field}" for field in AMOUNT_FIELDS)}
+        from `tab{SUMMARY_DOCTYPE}`
+        where 1 = 1
+            {"and period >= %(from_date)s" if values["from_date"] else ""}
+            {"and period <= %(to_date)s" if values["to_date"] else ""}
+            {"and platform = %(platform)s" if platform else ""}
+    """, values, as_dict=True)[0]
+    totals["outstanding_amount"] = totals.invoiced_amount - totals.paid_amount
+    return totals
+
+
+@frappe.whitelist(methods=["POST"])
+def rebuild_lease_revenue_summary():
+    """Rebuild the summary table from scratch (System Manager only)"""
+    frappe.only_for("System Manager")
+    contracts = rebuild_revenue_summary()
+    frappe.logger().info(f"Lease revenue summary rebuilt from {contracts} contracts")
+    return {"contracts": contracts}
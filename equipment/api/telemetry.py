@@ -0,0 +1,199 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, get_datetime, now_datetime
+
+from equipment.utils.instrumentation import instrument
+
+TELEMETRY_DOCTYPE = "Equipment Telemetry Reading"
+TELEMETRY_INSERT_CHUNK_SIZE = 1000
+MAX_TELEMETRY_BATCH = 50000
+MAX_TELEMETRY_POINTS = 5000
+
+# assets with readings not yet copied to Asset.last_fuel_level / last_odometer_reading
+DIRTY_ASSETS_KEY = "equipment:telemetry:dirty_assets"
+
+# downsampling interval -> bucket length in seconds
+TELEMETRY_INTERVALS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_readings(readings):
+    """
+    Readings as (asset, reading_time, fuel_level, odometer_reading) tuples
+
+    Each reading is either an object with asset, timestamp, fuel and odometer
+    keys or a compact [asset, timestamp, fuel, odometer] array.
+
+    Returns:
+        tuple: (valid readings, errors as {"row", "error"})
+    """
+    readings = frappe.parse_json(readings) if isinstance(readings, str) else readings
+    parsed, errors = [], []
+    for idx, reading in enumerate(readings or []):
+        try:
+            if isinstance(reading, dict):
+                reading = (reading.get("asset"), reading.get("timestamp"), reading.get("fuel"), reading.get("odometer"))
+            asset, timestamp, fuel, odometer = reading
+            if not asset or not timestamp:
+                raise ValueError("asset and timestamp are required")
+            if fuel is None and odometer is None:
+                raise ValueError("fuel or odometer is required")
+            parsed.append((
+                asset,
+                get_datetime(timestamp),
+                None if fuel is None else flt(fuel),
+                None if odometer is None else flt(odometer),
+            ))
+        except Exception as e:
+            errors.append({"row": idx, "error": str(e)})
+    return parsed, errors
+
+
+@frappe.whitelist(methods=["POST"])
+@instrument()
+def ingest_telemetry(readings):
+    """
+    Append a batch of fuel / odometer readings to the telemetry table
+
+    Readings are written with multi-row INSERTs; a reading repeated for the
+    same asset and time replaces the earlier one, so devices can safely
+    resend a batch. Asset is not saved here: the assets are marked dirty
+    and flush_asset_telemetry() copies their latest values in one UPDATE.
+
+    Args:
+        readings (list): JSON list of {asset, timestamp, fuel, odometer} objects
+            or [asset, timestamp, fuel, odometer] arrays
+
+    Returns:
+        dict: Number of readings stored and per-row errors
+    """
+    frappe.has_permission(TELEMETRY_DOCTYPE, "create", throw=True)
+
+    parsed, errors = parse_readings(readings)
+    if len(parsed) + len(errors) > MAX_TELEMETRY_BATCH:
+        frappe.throw(_("At most {0} readings can be sent in one batch").format(MAX_TELEMETRY_BATCH))
+
+    known_assets = set(frappe.get_all("Asset", filters={"name": ["in", list({r[0] for r in parsed})]}, pluck="name")) \
+        if parsed else set()
+    rows = []
+    for reading in parsed:
+        if reading[0] in known_assets:
+            rows.append(reading)
+        else:
+            errors.append({"asset": reading[0], "error": "Asset not found"})
+
+    now, user = now_datetime(), frappe.session.user
+    for start in range(0, len(rows), TELEMETRY_INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + TELEMETRY_INSERT_CHUNK_SIZE]
+        frappe.db.sql(f"""
+            insert into `tab{TELEMETRY_DOCTYPE}`
+                (creation, modified, owner, modified_by, asset, reading_time, fuel_level, odometer_reading)
+            values {", ".join(["%s"] * len(chunk))}
+            on duplicate key update
+                fuel_level = values(fuel_level),
+                odometer_reading = values(odometer_reading),
+                modified = values(modified)
+        """, tuple((now, now, user, user, *reading) for reading in chunk))
+
+    if rows:
+        frappe.db.commit()
+        pipeline = frappe.cache().pipeline()
+        pipeline.sadd(frappe.cache().make_key(DIRTY_ASSETS_KEY), *{reading[0] for reading in rows})
+        pipeline.execute()
+
+    return {"stored": len(rows), "failed": len(errors), "errors": errors}
+
+
+def flush_asset_telemetry():
+    """
+    Scheduled: copy the latest reading of every dirty asset to its last_* fields
+
+    All readings since the previous flush collapse into one UPDATE per run,
+    however often the machines report.
+
+    Returns:
+        int: Number of assets flushed
+    """
+    key = frappe.cache().make_key(DIRTY_ASSETS_KEY)
+    pipeline = frappe.cache().pipeline()
+    pipeline.smembers(key)
+    pipeline.delete(key)
+    assets = sorted(frappe.safe_decode(asset) for asset in pipeline.execute()[0])
+    if not assets:
+        return 0
+
+    try:
+        update_asset_telemetry(assets)
+        frappe.db.commit()
+    except Exception:
+        # keep them dirty for the next run, raw like ingest_telemetry writes them
+        frappe.cache().pipeline().sadd(key, *assets).execute()
+        raise
+    return len(assets)
+
+
+def update_asset_telemetry(assets):
+    """Set last_fuel_level / last_odometer_reading of `assets` from their latest reading"""
+    frappe.db.sql(f"""
+        update `tabAsset` asset
+        inner join (
+            select reading.asset, reading.fuel_level, reading.odometer_reading
+            from `tab{TELEMETRY_DOCTYPE}` reading
+            inner join (
+                select asset, max(reading_time) as reading_time
+                from `tab{TELEMETRY_DOCTYPE}`
+                where asset in %(assets)s
+                group by asset
+            ) latest on latest.asset = reading.asset and latest.reading_time = reading.reading_time
+        ) latest_reading on latest_reading.asset = asset.name
+        set asset.last_fuel_level = ifnull(latest_reading.fuel_level, asset.last_fuel_level),
+            asset.last_odometer_reading = ifnull(latest_reading.odometer_reading, asset.last_odometer_reading)
+    """, {"assets": tuple(assets)})
+
+
+@frappe.whitelist()
+@instrument(label="asset")
+def get_telemetry(asset, from_time, to_time, interval="hour"):
+    """
+    Downsampled readings of one asset for charts and consumption reports
+
+    Args:
+        asset (str): Asset name
+        from_time (str): Start of the range
+        to_time (str): End of the range (exclusive)
+        interval (str or int, optional): minute, hour, day or a bucket length in seconds
+
+    Returns:
+        list: Per bucket: start, readings, min/avg/max/last fuel level, first/last
+            odometer reading and the distance covered
+    """
+    frappe.has_permission(TELEMETRY_DOCTYPE, "read", throw=True)
+    seconds = TELEMETRY_INTERVALS.get(interval) or cint(interval)
+    if seconds <= 0:
+        frappe.throw(_("Interval must be one of {0} or a number of seconds").format(", ".join(TELEMETRY_INTERVALS)))
+
+    values = {
+        "asset": asset,
+        "from_time": get_datetime(from_time),
+        "to_time": get_datetime(to_time),
+        "seconds": seconds,
+        "limit": MAX_TELEMETRY_POINTS,
+    }
+    return frappe.db.sql("""
+        select
+            from_unixtime(floor(unix_timestamp(reading_time) / %(seconds)s) * %(seconds)s) as bucket_start,
+            count(*) as readings,
+            min(fuel_level) as min_fuel_level,
+            avg(fuel_level) as avg_fuel_level,
+            max(fuel_level) as max_fuel_level,
+            substring_index(group_concat(fuel_level order by reading_time desc), ',', 1) + 0 as last_fuel_level,
+            min(odometer_reading) as first_odometer_reading,
+            max(odometer_reading) as last_odometer_reading,
+            max(odometer_reading) - min(odometer_reading) as distance
+        from `tabEquipment Telemetry Reading`
+        where asset = %(asset)s
+            and reading_time >= %(from_time)s
+            and reading_time < %(to_time)s
+        group by bucket_start
+        order by bucket_start
+        limit %(limit)s
+    """, values, as_dict=True)
@@ -0,0 +1,214 @@
+"""
+Benchmarks for the lease contract lifecycle and the scheduler jobs.
+
+Runs against the MariaDB database of a local site:
+
+    bench --site <site> execute equipment.benchmarks.lease_contract.run \
+        --kwargs "{'contracts': 1000, 'years': 5}"
+
+Seeded contracts are spread evenly over every billing cycle and half of
+their periods are already due. An asset cannot be leased twice at the same
+time, so every contract gets its own (unlinked) asset; with a real `asset`
+the contracts instead share it in consecutive, non-overlapping slices of
+the `years` range. Each scenario records wall time, query count and peak
+Python memory, and the results are written as JSON to `output` (default:
+sites/<site>/private/benchmarks/) so runs of different releases can be
+compared. Seeded contracts are deleted afterwards, after their amounts are
+taken out of the Lease Revenue Summary.
+
+Invoice creation needs real masters and posts real Sales Invoices, so it
+is only benchmarked when `customer` and `rent_item` are passed. The
+invoices are cancelled again, but their GL entries remain; use a
+throwaway site for that.
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_days, cint, now, nowdate
+
+from equipment import __version__
+from equipment.api.payment_status import update_payment_schedule_status
+from equipment.api.rent_invoice import get_due_payments, process_due_payments
+from equipment.equipment.doctype.equipment_lease_contract.equipment_lease_contract import materialize_due_periods
+from equipment.utils import revenue
+from equipment.utils.availability import clear_lease_intervals
+from equipment.utils.schedule import BILLING_CYCLES
+
+
+@contextmanager
+def measure(results, scenario, rows=None):
+    """Record wall time, query count and peak memory of the wrapped block under `scenario`"""
+    counter = {"queries": 0}
+    original_sql = frappe.db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter["queries"] += 1
+        return original_sql(*args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield counter
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        frappe.db.sql = original_sql
+        results[scenario] = {
+            "seconds": round(elapsed, 4),
+            "queries": counter["queries"],
+            "peak_memory_kb": round(peak / 1024, 1),
+            "rows": counter.get("rows", rows),
+        }
+
+
+def seed_contracts(run_id, contracts, years, compact_schedule=0, customer=None, rent_item=None, asset=None):
+    """Insert and submit `contracts` lease contracts across all billing cycles"""
+    days = int(365 * years)
+    first_day = add_days(nowdate(), -(days // 2))
+    # a shared real asset is leased in back-to-back slices to pass the overlap check
+    slice_days = max(days // contracts, 1) if asset else days
+    names = []
+    for i in range(contracts):
+        start_date = add_days(first_day, i * slice_days) if asset else first_day
+        doc = frappe.get_doc({
+            "doctype": "Equipment Lease Contract",
+            "contract_number": f"BENCH-{run_id}-{i}",
+            "lessee": customer or "Benchmark Customer",
+            "leased_equipment": asset or f"Benchmark Asset {run_id}-{i}",
+            "rent_item": rent_item,
+            "start_date": start_date,
+            "end_date": add_days(start_date, slice_days - 1),
+            "billing_cycle": BILLING_CYCLES[i % len(BILLING_CYCLES)],
+            "lease_amount": 1000,
+            "platform_commission_percentage": 10,
+            "compact_schedule": compact_schedule,
+        })
+        doc.flags.ignore_links = True
+        doc.insert(ignore_permissions=True)
+        doc.submit()
+        names.append(doc.name)
+    return names
+
+
+def delete_contracts(run_id):
+    """
+    Remove the seeded contracts and everything they left behind
+
+    The invoices posted by the invoicing scenario are cancelled and the
+    contracts' scheduled and billed amounts are taken out of the Lease
+    Revenue Summary before the rows are deleted.
+    """
+    prefix = {"prefix": f"BENCH-{run_id}-%"}
+    contracts = frappe.get_all("Equipment Lease Contract",
+        filters={"contract_number": ["like", prefix["prefix"]], "docstatus": 1},
+        fields=["name", "start_date", "end_date", "billing_cycle", "lease_amount",
+                "platform_commission_percentage", "leased_equipment", *revenue.KEY_FIELDS])
+    names = [contract.name for contract in contracts]
+
+    if names:
+        invoices = frappe.get_all("Equipment Lease Contract Detail",
+            filters={"parent": ["in", names], "parenttype": "Equipment Lease Contract", "invoice": ["is", "set"]},
+            pluck="invoice", distinct=True)
+        for invoice in invoices:
+            invoice = frappe.get_doc("Sales Invoice", invoice)
+            if invoice.docstatus == 1:
+                invoice.cancel()
+
+        summary_rows = set()
+        for contract in contracts:
+            summary_rows.update(revenue.apply_contract(contract, sign=-1))
+            clear_lease_intervals(contract.leased_equipment)
+        frappe.db.sql("""
+            update `tabEquipment Lease Contract` set docstatus = 2 where name in %(names)s
+        """, {"names": tuple(names)})
+        # cancelled contracts no longer count as billed
+        revenue.refresh_billed_amounts(names)
+        revenue.delete_empty_rows(list(summary_rows))
+
+    frappe.db.sql("""
+        delete detail from `tabEquipment Lease Contract Detail` detail
+        inner join `tabEquipment Lease Contract` contract on contract.name = detail.parent
+        where contract.contract_number like %(prefix)s
+    """, prefix)
+    frappe.db.sql("""
+        delete from `tabEquipment Lease Contract` where contract_number like %(prefix)s
+    """, prefix)
+    frappe.db.commit()
+
+
+def run(contracts=100, years=1, compact_schedule=0, output=None, customer=None, rent_item=None, asset=None):
+    """
+    Seed contracts, run every scenario and write the results as JSON
+
+    Args:
+        contracts (int, optional): Number of contracts to seed
+        years (float, optional): Length of each contract in years
+        compact_schedule (int, optional): Seed compact schedule contracts
+        output (str, optional): Path of the JSON result file
+        customer, rent_item, asset (str, optional): Real masters, needed to benchmark invoicing
+
+    Returns:
+        dict: The benchmark results
+    """
+    contracts, years, compact_schedule = cint(contracts), float(years), cint(compact_schedule)
+    run_id = frappe.generate_hash(length=8)
+    scenarios = {}
+
+    try:
+        with measure(scenarios, "insert_and_submit", rows=contracts):
+            names = seed_contracts(run_id, contracts, years, compact_schedule, customer, rent_item, asset)
+        frappe.db.commit()
+
+        docs = [frappe.get_doc("Equipment Lease Contract", name) for name in names]
+        with measure(scenarios, "validate_unchanged", rows=len(docs)):
+            for doc in docs:
+                doc.load_doc_before_save()
+                doc.run_method("validate")
+
+        with measure(scenarios, "validate_terms_changed", rows=len(docs)):
+            for doc in docs:
+                doc.load_doc_before_save()
+                doc.lease_amount += 1
+                doc.run_method("validate")
+        del docs
+
+        with measure(scenarios, "materialize_due_periods") as counter:
+            counter["rows"] = materialize_due_periods()
+        frappe.db.commit()
+
+        with measure(scenarios, "plan_due_payments") as counter:
+            due_payments = get_due_payments()
+            counter["rows"] = sum(len(payments) for payments in due_payments.values())
+
+        if customer and rent_item:
+            payment_names = [p.name for payments in due_payments.values() for p in payments]
+            with measure(scenarios, "auto_generate_rent_invoices") as counter:
+                counter["rows"] = process_due_payments(payment_names)["invoiced"]
+
+        with measure(scenarios, "update_payment_schedule_status") as counter:
+            counter["rows"] = update_payment_schedule_status(full=1)["checked"]
+        frappe.db.rollback()
+    finally:
+        delete_contracts(run_id)
+
+    results = {
+        "run_id": run_id,
+        "site": frappe.local.site,
+        "app_version": __version__,
+        "created": now(),
+        "params": {"contracts": contracts, "years": years, "compact_schedule": compact_schedule},
+        "scenarios": scenarios,
+    }
+
+    output = output or frappe.get_site_path("private", "benchmarks", f"lease_contract_{run_id}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1)
+
+    return results
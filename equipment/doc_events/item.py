@@ -1,26 +1,108 @@
 import frappe
 
+from equipment.utils.cache import get_cached_lookup, clear_cached_lookup
+
+RENT_ITEM_GROUP = "Rent"
+
+
 def rent_item(doc, event):
-    rent_group = frappe.db.get_list('Item Group',filters={'name': "Rent"},fields=['name'],as_list=True)
-    if not rent_group:
-        new_rent_group = frappe.get_doc(dict(
-            doctype = 'Item Group',
-            item_group_name = "Rent"
-        ))
-        new_rent_group.save()
+    """
+    Asset on_submit: create the rent item in the background
+
+    Assets submitted in the same transaction are collected and handed to a
+    single create_rent_items job once the transaction is committed, so the
+    submit itself does not wait for the Item inserts.
+    """
+    pending = getattr(frappe.local, "equipment_pending_rent_items", None)
+    if pending is None:
+        pending = frappe.local.equipment_pending_rent_items = []
+        frappe.db.after_commit.add(enqueue_pending_rent_items)
+        frappe.db.after_rollback.add(clear_pending_rent_items)
+    pending.append(doc.name)
+
+
+def enqueue_pending_rent_items():
+    asset_names = getattr(frappe.local, "equipment_pending_rent_items", None)
+    clear_pending_rent_items()
+    if asset_names:
+        frappe.enqueue("equipment.doc_events.item.create_rent_items", queue="short", asset_names=asset_names)
+
+
+def clear_pending_rent_items():
+    frappe.local.equipment_pending_rent_items = None
+
 
-    rent = frappe.db.get_list('Item',filters={'custom_asset': doc.name},fields=['custom_asset'],as_list=True)
-    if not rent:
+def create_rent_items(asset_names):
+    """
+    Create the missing rent items of many submitted assets in one pass
+
+    Each item is inserted under its own savepoint: a failing asset is logged
+    and rolled back alone, as the submit that queued the job has already
+    committed and nothing would retry the rest of the batch.
+
+    Args:
+        asset_names (list): Asset names
+
+    Returns:
+        list: Codes of the created rent items
+    """
+    ensure_rent_item_group()
+
+    assets = frappe.get_all("Asset",
+        filters={"name": ["in", asset_names], "docstatus": 1},
+        fields=["name", "asset_name"])
+    existing = set(frappe.get_all("Item",
+        filters={"custom_asset": ["in", asset_names]},
+        pluck="custom_asset"))
+
+    created = []
+    for asset in assets:
+        if asset.name in existing:
+            continue
         new_rent_item = frappe.get_doc(dict(
             doctype = 'Item',
-            item_code = doc.name + ': ' + doc.asset_name + ' - ' + "Rent",
-            item_name = doc.name + ': ' + doc.asset_name + ' - ' + "Rent",
-            item_group = "Rent",
+            item_code = asset.name + ': ' + asset.asset_name + ' - ' + "Rent",
+            item_name = asset.name + ': ' + asset.asset_name + ' - ' + "Rent",
+            item_group = RENT_ITEM_GROUP,
             stock_uom = "Nos",
             is_stock_item = 0,
             include_item_in_manufacturing = 0,
             is_fixed_asset = 0,
             custom_is_rent_item = 1,
-            custom_asset = doc.name
+            custom_asset = asset.name
         ))
-        new_rent_item.save()
\ No newline at end of file
+        frappe.db.savepoint("rent_item")
+        try:
+            new_rent_item.save()
+        except Exception:
+            frappe.db.rollback(save_point="rent_item")
+            frappe.log_error(title=f"Rent item creation failed for {asset.name}")
+            continue
+        created.append(new_rent_item.name)
+    return created
+
+
+@frappe.whitelist()
+def create_missing_rent_items():
+    """Backfill rent items for every submitted asset that has none"""
+    frappe.only_for("System Manager")
+    asset_names = frappe.db.sql_list("""
+        select asset.name
+        from `tabAsset` asset
+        where asset.docstatus = 1
+            and not exists (select 1 from `tabItem` item where item.custom_asset = asset.name)
+    """)
+    return create_rent_items(asset_names) if asset_names else []
+
+
+def ensure_rent_item_group():
+    """Create the "Rent" Item Group if needed; its existence is remembered in cache"""
+    if get_cached_lookup("item_group", RENT_ITEM_GROUP,
+            lambda: frappe.db.exists("Item Group", RENT_ITEM_GROUP)):
+        return
+
+    frappe.get_doc(dict(
+        doctype = 'Item Group',
+        item_group_name = RENT_ITEM_GROUP
+    )).insert(ignore_permissions=True)
+    clear_cached_lookup("item_group", RENT_ITEM_GROUP)
@@ -0,0 +1,5 @@
+from equipment.api.fuel import unlink_fuel_journal_entry
+
+def release_fuel_expense(doc, event):
+    # cancelled entries give their fuel consumption back to the next posting run
+    unlink_fuel_journal_entry(doc.name)
@@ -0,0 +1,10 @@
+from equipment.api.payment_status import sync_invoice_statuses
+
+def sync_payment_schedule_status(doc, event):
+    # Payment Entry updates the outstanding amount and status of the
+    # referenced invoices without running their hooks
+    sync_invoice_statuses([
+        ref.reference_name
+        for ref in doc.references
+        if ref.reference_doctype == "Sales Invoice"
+    ])
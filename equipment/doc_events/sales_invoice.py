@@ -0,0 +1,9 @@
+from equipment.api.overtime import unlink_overtime_invoice
+from equipment.api.payment_status import sync_invoice_statuses
+
+def sync_payment_schedule_status(doc, event):
+    sync_invoice_statuses([doc.name])
+
+def release_overtime(doc, event):
+    # cancelled invoices give their overtime back to the next rent invoice
+    unlink_overtime_invoice(doc.name)
@@ -0,0 +1,16 @@
+# Copyright (c) 2025, Equipment and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from equipment.utils.clauses import get_content_hash
+
+
+class ClauseSnapshot(Document):
+	def validate(self):
+		if not self.is_new():
+			frappe.throw(_("Clause snapshots cannot be changed, edit the template to create a new version"))
+		if self.content_hash != get_content_hash(self.terms):
+			frappe.throw(_("Content Hash does not match the terms"))
@@ -14,6 +14,10 @@ frappe.ui.form.on('Equipment Lease Contract', {
     },
     lease_amount: function(frm) {
         update_hourly_rate(frm);
+        calculate_all_durations(frm);
+    },
+    platform_commission_percentage: function(frm) {
+        calculate_all_durations(frm);
     },
     total_agreed_hours: function(frm) {
         update_hourly_rate(frm);
@@ -54,40 +58,25 @@ function validate_and_calculate(frm) {
 
 
 function calculate_all_durations(frm) {
-    var start = frm.doc.start_date;
-    var end = frm.doc.end_date;
-    var cycle = frm.doc.billing_cycle;
-
-    if (start && end && cycle) {
-        var s = new Date(start);
-        var e = new Date(end);
-        var value = 1;
-
-        if (cycle === "Daily") {
-            value = Math.abs(Math.floor((e - s) / (1000 * 60 * 60 * 24))) + 1;
-            frm.set_value('contract_duration_days', value);
-            frm.set_value('contract_duration_weeks',"");
-            frm.set_value('contract_duration_months',"");
-            frm.set_value('contract_duration_years',"");
-        } else if (cycle === "Weekly") {
-            value = Math.ceil((Math.abs(e - s) / (1000 * 60 * 60 * 24) + 1) / 7);
-            frm.set_value('contract_duration_days',"");
-            frm.set_value('contract_duration_weeks', value);
-            frm.set_value('contract_duration_months',"");
-            frm.set_value('contract_duration_years',"");
-        } else if (cycle === "Monthly") {
-            value = (e.getFullYear() - s.getFullYear()) * 12 + (e.getMonth() - s.getMonth()) + 1;
-            frm.set_value('contract_duration_days',"");
-            frm.set_value('contract_duration_weeks',"");
-            frm.set_value('contract_duration_months', value);
-            frm.set_value('contract_duration_years',"");
-        } else if (cycle === "Yearly") {
-            value = (e.getFullYear() - s.getFullYear()) + 1;
-            frm.set_value('contract_duration_days',"");
-            frm.set_value('contract_duration_weeks',"");
-            frm.set_value('contract_duration_months',"");
-            frm.set_value('contract_duration_years', value);
-        }
+    // durations and totals come from the server so the form and the saved
+    // payment schedule always count periods the same way
+    if (frm.doc.start_date && frm.doc.end_date && frm.doc.billing_cycle) {
+        frappe.call({
+            method: "equipment.equipment.doctype.equipment_lease_contract.equipment_lease_contract.get_schedule_summary",
+            args: {
+                start_date: frm.doc.start_date,
+                end_date: frm.doc.end_date,
+                billing_cycle: frm.doc.billing_cycle,
+                lease_amount: frm.doc.lease_amount || 0,
+                platform_commission_percentage: frm.doc.platform_commission_percentage || 0
+            },
+            callback: function(r) {
+                if (r.message) {
+                    delete r.message.periods;
+                    frm.set_value(r.message);
+                }
+            }
+        });
     }
 }
 function fetch_and_set_rent_item(frm) {
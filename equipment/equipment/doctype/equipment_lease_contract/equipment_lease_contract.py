@@ -1,21 +1,110 @@
 # Copyright (c) 2025, Equipment and contributors
 # For license information, please see license.txt
+from itertools import islice
+
 import frappe
+from frappe import _
 from frappe.model.document import Document
-from frappe.utils import date_diff , getdate , add_days, add_months, add_years
+from frappe.utils import date_diff , getdate, today, add_days, cint, get_link_to_form
+
+from equipment.utils import clauses, geo, schedule
+from equipment.utils.availability import find_overlapping_lease, clear_lease_intervals
+from equipment.utils.revenue import apply_contract, refresh_billed_amounts, delete_empty_rows
+
+# The payment schedule is only rebuilt when one of these changes
+PAYMENT_SCHEDULE_FIELDS = ("start_date", "end_date", "billing_cycle", "lease_amount", "platform_commission_percentage", "compact_schedule")
 
 class EquipmentLeaseContract(Document):
 
+    def onload(self):
+        self.resolve_clauses()
+
+    def before_print(self, settings=None):
+        self.resolve_clauses()
+
+    def before_update_after_submit(self):
+        self.strip_resolved_clauses()
+
     def on_submit(self):
         self.calculate_contract_days()
+        clear_lease_intervals(self.leased_equipment)
+        apply_contract(self)
         # subscription = self.create_subscription()
         # self.link_subscription(subscription)
         # self.update_asset_status()
 
+    def on_cancel(self):
+        clear_lease_intervals(self.leased_equipment)
+        summary_rows = apply_contract(self, sign=-1)
+        refresh_billed_amounts([self.name])
+        # only now are the billed amounts of the cancelled contract gone as well
+        delete_empty_rows(summary_rows)
+
     def validate(self):
+        self.validate_equipment_availability()
+        self.set_geohash()
+        self.set_clause_snapshots()
         self.calculate_platform_commission()
         self.calculate_totals()
-        self.create_payment_schedule()
+        if self.payment_schedule_inputs_changed():
+            self.create_payment_schedule()
+
+    def validate_equipment_availability(self):
+        if not (self.leased_equipment and self.start_date and self.end_date):
+            return
+        if getdate(self.end_date) < getdate(self.start_date):
+            frappe.throw(_("End Date cannot be before Start Date"))
+
+        overlapping = find_overlapping_lease(self.leased_equipment, self.start_date, self.end_date, exclude=self.name)
+        if overlapping:
+            frappe.throw(
+                _("Equipment {0} is already leased under {1} during this period").format(
+                    frappe.bold(self.leased_equipment), get_link_to_form(self.doctype, overlapping)
+                ),
+                title=_("Overlapping Lease"),
+            )
+
+    def set_geohash(self):
+        if self.latitude or self.longitude:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = None
+
+    def set_clause_snapshots(self):
+        """Reference content-hashed clause snapshots instead of storing the clause text"""
+        if not clauses.reference_clause_snapshots():
+            return
+
+        for text_field, template_field, template_doctype, snapshot_field in clauses.CLAUSE_FIELDS:
+            text, template = self.get(text_field), self.get(template_field)
+            # the text of a saved contract may just be its old snapshot resolved for
+            # the form, so a newly selected template takes precedence over it
+            template_changed = template and not self.is_new() and self.has_value_changed(template_field)
+            if template_changed or (template and not text and not self.get(snapshot_field)):
+                # copy-on-select: point at the template's current version
+                self.set(snapshot_field, clauses.get_template_snapshot(template_doctype, template))
+                self.set(text_field, None)
+            elif text:
+                self.set(snapshot_field, clauses.get_snapshot(text, template_doctype, template))
+                self.set(text_field, None)
+
+    def resolve_clauses(self):
+        """Fill the clause fields from their snapshots for the form and print formats"""
+        for text_field, _template_field, _template_doctype, snapshot_field in clauses.CLAUSE_FIELDS:
+            if self.get(snapshot_field) and not self.get(text_field):
+                self.set(text_field, clauses.get_clause_text(self.get(snapshot_field)))
+
+    def strip_resolved_clauses(self):
+        """Drop clause text that only mirrors its snapshot, as filled in by resolve_clauses()"""
+        for text_field, _template_field, _template_doctype, snapshot_field in clauses.CLAUSE_FIELDS:
+            text = self.get(text_field)
+            if text and self.get(snapshot_field) == clauses.get_content_hash(text):
+                self.set(text_field, None)
+
+    def payment_schedule_inputs_changed(self):
+        if self.is_new() or not self.payment_schedule_table:
+            return True
+        return any(self.has_value_changed(field) for field in PAYMENT_SCHEDULE_FIELDS)
 
     def calculate_platform_commission(self):
         if self.lease_amount and self.platform_commission_percentage:
@@ -29,44 +118,57 @@ class EquipmentLeaseContract(Document):
             days = date_diff(self.end_date, self.start_date) + 1
             self.contract_days = days
     
+    def get_payment_schedule(self):
+        """
+        Due dates and amounts of the billing periods kept as schedule rows
+
+        A compact schedule only keeps the periods that are already due; the
+        later ones are added by materialize_due_periods() as they fall due.
+        """
+        last_period = None
+        if self.compact_schedule:
+            last_period = schedule.count_periods(
+                self.start_date, min(getdate(self.end_date), getdate(today())), self.billing_cycle
+            )
+        return [
+            dict(period, status="Unpaid")
+            for period in schedule.build_schedule(
+                self.start_date, self.end_date, self.billing_cycle,
+                self.lease_amount, self.platform_commission_percentage,
+                last_period=last_period
+            )
+        ]
+
     def create_payment_schedule(self):
-        self.set("payment_schedule_table", [])
-        start = getdate(self.start_date)
-        end = getdate(self.end_date)
-        cycle = self.billing_cycle
-        lease_amount = self.lease_amount or 0
-        commission_percent = self.platform_commission_percentage or 0
-
-        current = start
-
-        while current <= end:
-            if cycle == "Daily":
-                due_date = current
-                next_date = add_days(current, 1)
-            elif cycle == "Weekly":
-                due_date = current
-                next_date = add_days(current, 7)
-            elif cycle == "Monthly":
-                due_date = current
-                next_date = add_months(current, 1)
-            elif cycle == "Yearly":
-                due_date = current
-                next_date = add_years(current, 1)
-            else:
-                break
+        """
+        Diff the schedule of the current terms against the existing rows
 
-            commission = lease_amount * commission_percent / 100
-            owner_amount = lease_amount - commission
+        Rows are matched by due date. Unbilled rows are updated in place or
+        dropped, new periods are appended, and invoiced or paid rows are always
+        kept untouched so their invoice links survive a change of terms.
+        """
+        existing_rows = {}
+        locked_rows = []
+        for row in self.payment_schedule_table:
+            if is_locked_payment(row):
+                locked_rows.append(row)
+            else:
+                existing_rows.setdefault(getdate(row.due_date), row)
 
-            self.append("payment_schedule_table", {
-                "due_date": due_date,
-                "amount": lease_amount,
-                "platform_commission_amount": commission,
-                "owner_amount": owner_amount,
-                "status": "Unpaid"
-            })
+        locked_dates = {getdate(row.due_date) for row in locked_rows}
+        rows = list(locked_rows)
+        for period in self.get_payment_schedule():
+            if period["due_date"] in locked_dates:
+                continue
+            row = existing_rows.pop(period["due_date"], None)
+            if row is None:
+                rows.append(period)
+            else:
+                row.update(period)
+                rows.append(row)
 
-            current = next_date
+        rows.sort(key=lambda row: getdate(row.get("due_date")))
+        self.set("payment_schedule_table", rows)
         
     # def create_payment_schedule(self):
     #     self.set("payment_schedule_table", [])
@@ -107,24 +209,12 @@ class EquipmentLeaseContract(Document):
 
         
     def calculate_totals(self):
-        cycles = 1
-        if self.start_date and self.end_date and self.billing_cycle:
-            start = getdate(self.start_date)
-            end = getdate(self.end_date)
-            days = date_diff(end, start) + 1
-            if self.billing_cycle == "Daily":
-                cycles = days
-            elif self.billing_cycle == "Weekly":
-                cycles = days // 7
-            elif self.billing_cycle == "Monthly":
-                cycles = max(1, (end.year - start.year) * 12 + (end.month - start.month) + 1)
-            elif self.billing_cycle == "Yearly":
-                cycles = max(1, end.year - start.year + 1)
-        lease_amount = self.lease_amount or 0
-        commission_percent = self.platform_commission_percentage or 0
-        self.total_lease_amount = lease_amount * cycles
-        self.total_platform_commission_amount = self.total_lease_amount * commission_percent / 100
-        self.total_owner_amount = self.total_lease_amount - self.total_platform_commission_amount
+        summary = schedule.get_schedule_summary(
+            self.start_date, self.end_date, self.billing_cycle,
+            self.lease_amount, self.platform_commission_percentage
+        )
+        summary.pop("periods")
+        self.update(summary)
 
     def create_subscription(self):
         subscription = frappe.new_doc("Subscription")
@@ -156,3 +246,99 @@ class EquipmentLeaseContract(Document):
             asset.status_asset = "Leased"
             asset.save(ignore_permissions=True)
             frappe.msgprint(f"Asset {asset.name} status changed to Leased", alert=True)
+
+
+def is_locked_payment(row):
+    """Invoiced or paid schedule rows are never regenerated"""
+    return bool(row.invoice) or row.status in ("Paid", "Partly Paid")
+
+
+@frappe.whitelist()
+def get_schedule_summary(start_date=None, end_date=None, billing_cycle=None, lease_amount=0, platform_commission_percentage=0):
+    """Durations and totals for the contract form, computed the same way as on save"""
+    return schedule.get_schedule_summary(
+        start_date, end_date, billing_cycle, lease_amount, platform_commission_percentage
+    )
+
+
+@frappe.whitelist()
+def get_schedule_preview(contract, from_date=None, limit=100):
+    """
+    Upcoming billing periods of a contract, generated from its billing rule
+
+    Works the same for compact and fully materialized schedules and never
+    writes schedule rows.
+
+    Args:
+        contract (str): Equipment Lease Contract name
+        from_date (str, optional): First due date to include, defaults to today
+        limit (int, optional): Maximum number of periods returned
+    """
+    frappe.has_permission("Equipment Lease Contract", "read", contract, throw=True)
+    terms = frappe.db.get_value("Equipment Lease Contract", contract, [
+        "start_date", "end_date", "billing_cycle", "lease_amount", "platform_commission_percentage"
+    ], as_dict=True)
+    first_period = schedule.count_periods(terms.start_date, add_days(getdate(from_date or today()), -1), terms.billing_cycle)
+    return list(islice(schedule.iter_schedule(
+        terms.start_date, terms.end_date, terms.billing_cycle,
+        terms.lease_amount, terms.platform_commission_percentage,
+        first_period=first_period
+    ), cint(limit)))
+
+
+def materialize_due_periods(as_of=None):
+    """
+    Add the schedule rows of compact contracts whose periods are due by `as_of`
+
+    Rows are inserted directly under the submitted contract without saving
+    it. Runs before rent invoicing so due periods can be planned and invoiced
+    like any other schedule row.
+
+    Returns:
+        int: Number of rows added
+    """
+    as_of = getdate(as_of or today())
+    contracts = frappe.db.sql("""
+        select
+            contract.name, contract.start_date, contract.end_date, contract.billing_cycle,
+            contract.lease_amount, contract.platform_commission_percentage,
+            max(detail.due_date) as last_due_date, count(detail.name) as row_count
+        from `tabEquipment Lease Contract` contract
+        left join `tabEquipment Lease Contract Detail` detail
+            on detail.parent = contract.name
+            and detail.parenttype = 'Equipment Lease Contract'
+            and detail.parentfield = 'payment_schedule_table'
+        where contract.docstatus = 1
+            and contract.compact_schedule = 1
+            and contract.start_date <= %(as_of)s
+        group by contract.name
+    """, {"as_of": as_of}, as_dict=True)
+
+    added = 0
+    for contract in contracts:
+        first_period = 0
+        if contract.last_due_date:
+            first_period = schedule.count_periods(contract.start_date, contract.last_due_date, contract.billing_cycle)
+        last_period = schedule.count_periods(
+            contract.start_date, min(getdate(contract.end_date), as_of), contract.billing_cycle
+        )
+
+        periods = schedule.build_schedule(
+            contract.start_date, contract.end_date, contract.billing_cycle,
+            contract.lease_amount, contract.platform_commission_percentage,
+            first_period=first_period, last_period=last_period
+        )
+        for idx, period in enumerate(periods, start=contract.row_count + 1):
+            frappe.get_doc(dict(
+                period,
+                doctype="Equipment Lease Contract Detail",
+                parent=contract.name,
+                parenttype="Equipment Lease Contract",
+                parentfield="payment_schedule_table",
+                idx=idx,
+                docstatus=1,
+                status="Unpaid"
+            )).db_insert()
+        added += len(periods)
+
+    return added
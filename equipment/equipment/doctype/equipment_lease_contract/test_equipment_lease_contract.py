@@ -1,9 +1,240 @@
 # Copyright (c) 2025, Equipment and Contributors
 # See license.txt
 
-# import frappe
+import math
+import random
+from datetime import date, timedelta
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from equipment.utils import availability, geo, schedule
+
 
 class TestEquipmentLeaseContract(FrappeTestCase):
 	pass
+
+
+class TestBillingSchedule(FrappeTestCase):
+	def test_count_periods(self):
+		cases = [
+			("2025-01-01", "2025-01-10", "Daily", 10),
+			("2025-01-01", "2025-01-01", "Daily", 1),
+			("2025-01-01", "2025-01-07", "Weekly", 1),
+			("2025-01-01", "2025-01-08", "Weekly", 2),
+			("2025-01-01", "2025-01-14", "Weekly", 2),
+			("2025-01-15", "2025-02-14", "Monthly", 1),
+			("2025-01-15", "2025-02-15", "Monthly", 2),
+			("2025-01-31", "2025-02-27", "Monthly", 1),
+			# Jan 31 + 1 month is clamped to Feb 28
+			("2025-01-31", "2025-02-28", "Monthly", 2),
+			("2025-01-01", "2025-12-31", "Monthly", 12),
+			("2025-03-10", "2026-03-09", "Yearly", 1),
+			("2025-03-10", "2026-03-10", "Yearly", 2),
+			("2024-02-29", "2025-02-27", "Yearly", 1),
+			("2024-02-29", "2025-02-28", "Yearly", 2),
+			("2025-01-10", "2025-01-09", "Monthly", 0),
+			("2025-01-01", "2025-12-31", "Hourly", 0),
+		]
+		for start, end, cycle, expected in cases:
+			with self.subTest(start=start, end=end, cycle=cycle):
+				self.assertEqual(schedule.count_periods(start, end, cycle), expected)
+
+	def test_count_periods_matches_due_dates(self):
+		start = date(2024, 1, 29)
+		for cycle in schedule.BILLING_CYCLES:
+			for days in (0, 1, 6, 7, 27, 30, 31, 59, 364, 365, 366, 800):
+				end = start + timedelta(days=days)
+				with self.subTest(cycle=cycle, end=end):
+					expected = 0
+					while schedule.get_due_date(start, cycle, expected) <= end:
+						expected += 1
+					self.assertEqual(schedule.count_periods(start, end, cycle), expected)
+
+	def test_month_end_clamping(self):
+		self.assertEqual(
+			schedule.get_due_dates("2025-01-31", "2025-05-30", "Monthly"),
+			[date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)],
+		)
+		self.assertEqual(
+			schedule.get_due_dates("2024-01-31", "2024-03-30", "Monthly"),
+			[date(2024, 1, 31), date(2024, 2, 29)],
+		)
+		self.assertEqual(
+			schedule.get_due_dates("2025-08-31", "2026-03-01", "Monthly")[-3:],
+			[date(2025, 12, 31), date(2026, 1, 31), date(2026, 2, 28)],
+		)
+
+	def test_weekly_and_yearly_due_dates(self):
+		self.assertEqual(
+			schedule.get_due_dates("2025-01-01", "2025-01-29", "Weekly"),
+			[date(2025, 1, 1), date(2025, 1, 8), date(2025, 1, 15), date(2025, 1, 22), date(2025, 1, 29)],
+		)
+		self.assertEqual(
+			schedule.get_due_dates("2024-02-29", "2028-02-29", "Yearly"),
+			[date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)],
+		)
+
+	def test_due_date_slices(self):
+		full = schedule.get_due_dates("2025-01-31", "2027-01-30", "Monthly")
+		self.assertEqual(len(full), 24)
+		self.assertEqual(schedule.get_due_dates("2025-01-31", "2027-01-30", "Monthly", 5, 9), full[5:9])
+		self.assertEqual(schedule.get_due_dates("2025-01-31", "2027-01-30", "Monthly", 20, 99), full[20:])
+
+	def test_iter_schedule_matches_build_schedule(self):
+		for cycle in schedule.BILLING_CYCLES:
+			for start, end in (("2025-01-31", "2025-12-30"), ("2024-02-29", "2029-03-01"), ("2025-06-15", "2025-06-15")):
+				with self.subTest(cycle=cycle, start=start, end=end):
+					built = schedule.build_schedule(start, end, cycle, 1000, 12.5)
+					self.assertEqual(list(schedule.iter_schedule(start, end, cycle, 1000, 12.5)), built)
+					self.assertEqual(
+						list(schedule.iter_schedule(start, end, cycle, 1000, 12.5, first_period=3)),
+						schedule.build_schedule(start, end, cycle, 1000, 12.5, first_period=3),
+					)
+
+	def test_period_amounts_and_summary(self):
+		period = schedule.get_period_amounts(1000, 12.5)
+		self.assertEqual(period, {"amount": 1000, "platform_commission_amount": 125, "owner_amount": 875})
+
+		summary = schedule.get_schedule_summary("2025-01-31", "2025-04-30", "Monthly", 1000, 12.5)
+		self.assertEqual(summary["periods"], 4)
+		self.assertEqual(summary["total_lease_amount"], 4000)
+		self.assertEqual(summary["total_platform_commission_amount"], 500)
+		self.assertEqual(summary["total_owner_amount"], 3500)
+		self.assertEqual(summary["contract_duration_months"], 4)
+		self.assertEqual(summary["contract_duration_days"], "")
+
+
+def lease(name, start, end):
+	return frappe._dict(name=name, start_date=start, end_date=end)
+
+
+def make_index(*leases):
+	return availability.build_interval_index(sorted(leases, key=lambda row: (row.start_date, row.end_date)))
+
+
+class TestLeaseAvailability(FrappeTestCase):
+	def assertOverlap(self, index, start, end, expected, exclude=None):
+		self.assertEqual(availability.find_overlap(index, date.fromisoformat(start), date.fromisoformat(end), exclude), expected)
+
+	def test_boundaries_are_inclusive(self):
+		index = make_index(lease("A", date(2025, 1, 10), date(2025, 1, 20)))
+		# adjacent on either side
+		self.assertOverlap(index, "2025-01-01", "2025-01-09", None)
+		self.assertOverlap(index, "2025-01-21", "2025-01-31", None)
+		# touching the first or the last day
+		self.assertOverlap(index, "2025-01-01", "2025-01-10", "A")
+		self.assertOverlap(index, "2025-01-20", "2025-01-31", "A")
+		self.assertOverlap(index, "2025-01-20", "2025-01-20", "A")
+
+	def test_nested_and_disjoint(self):
+		index = make_index(
+			lease("A", date(2025, 1, 1), date(2025, 1, 31)),
+			lease("B", date(2025, 3, 1), date(2025, 3, 31)),
+		)
+		self.assertOverlap(index, "2025-01-10", "2025-01-12", "A")
+		self.assertOverlap(index, "2024-12-01", "2025-04-30", "B")
+		self.assertOverlap(index, "2025-02-01", "2025-02-28", None)
+		self.assertOverlap(index, "2024-01-01", "2024-12-31", None)
+		self.assertOverlap(index, "2025-04-01", "2025-04-30", None)
+
+	def test_earlier_long_lease_covers_later_gap(self):
+		index = make_index(
+			lease("LONG", date(2025, 1, 1), date(2025, 12, 31)),
+			lease("SHORT", date(2025, 2, 1), date(2025, 2, 5)),
+		)
+		# after SHORT ended, only the earlier LONG lease still covers the range
+		self.assertOverlap(index, "2025-06-01", "2025-06-30", "LONG")
+		self.assertOverlap(index, "2025-06-01", "2025-06-30", None, exclude="LONG")
+		self.assertOverlap(index, "2025-02-03", "2025-02-03", "SHORT", exclude="LONG")
+
+	def test_empty_index(self):
+		self.assertOverlap(make_index(), "2025-01-01", "2025-12-31", None)
+
+	def test_matches_brute_force(self):
+		rng = random.Random(20251018)
+		origin = date(2025, 1, 1)
+		for _run in range(200):
+			leases = []
+			for i in range(rng.randint(0, 12)):
+				start = origin + timedelta(days=rng.randint(0, 120))
+				leases.append(lease(f"L{i}", start, start + timedelta(days=rng.choice((0, 1, 3, 10, 60)))))
+			index = make_index(*leases)
+
+			for _query in range(20):
+				start = origin + timedelta(days=rng.randint(-10, 130))
+				end = start + timedelta(days=rng.choice((0, 1, 5, 30)))
+				exclude = rng.choice([None] + [row.name for row in leases])
+				overlapping = {
+					row.name for row in leases
+					if row.name != exclude and row.start_date <= end and row.end_date >= start
+				}
+				found = availability.find_overlap(index, start, end, exclude)
+				if overlapping:
+					self.assertIn(found, overlapping)
+				else:
+					self.assertIsNone(found)
+
+
+def destination(latitude, longitude, distance_km, bearing):
+	"""Point `distance_km` away from a start point in the direction `bearing` (degrees)"""
+	angle = distance_km / geo.EARTH_RADIUS_KM
+	lat, lon, bearing = map(math.radians, (latitude, longitude, bearing))
+	lat2 = math.asin(math.sin(lat) * math.cos(angle) + math.cos(lat) * math.sin(angle) * math.cos(bearing))
+	lon2 = lon + math.atan2(
+		math.sin(bearing) * math.sin(angle) * math.cos(lat), math.cos(angle) - math.sin(lat) * math.sin(lat2)
+	)
+	return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+
+class TestGeohash(FrappeTestCase):
+	def test_known_vectors(self):
+		self.assertEqual(geo.encode(42.605, -5.603, 5), "ezs42")
+		self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+		self.assertEqual(geo.encode(-25.382708, -49.265506, 8), "6gkzwgjz")
+		self.assertEqual(geo.encode(0, 0, 1), "s")
+		self.assertEqual(geo.encode(-90, -180, 3), "000")
+
+	def test_decode_box_contains_point(self):
+		for latitude, longitude in ((42.605, -5.603), (57.64911, 10.40744), (-25.382708, -49.265506), (89.9, 179.9)):
+			for precision in (1, 5, 9):
+				min_lat, max_lat, min_lon, max_lon = geo.decode_box(geo.encode(latitude, longitude, precision))
+				self.assertTrue(min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon)
+
+	def test_haversine(self):
+		self.assertAlmostEqual(geo.haversine_km(0, 0, 0, 1), 111.195, places=2)
+		self.assertAlmostEqual(geo.haversine_km(51.5, 0, 51.5, 0), 0)
+
+	def assertCovered(self, latitude, longitude, radius_km):
+		cells = geo.covering_cells(latitude, longitude, radius_km)
+		for bearing in range(0, 360, 15):
+			for fraction in (0.5, 0.999):
+				point = destination(latitude, longitude, radius_km * fraction, bearing)
+				point_hash = geo.encode(*point, precision=12)
+				self.assertTrue(
+					any(point_hash.startswith(cell) for cell in cells),
+					f"{point} at {radius_km} km from {latitude}, {longitude} is outside {cells}",
+				)
+
+	def test_covering_cells_contain_radius(self):
+		for latitude in (0, 30, 60, 75, 85, -45, -80):
+			for longitude in (0.0, 10.40744, -179.999, 179.999):
+				for radius_km in (0.05, 1, 5, 25, 150, 800):
+					with self.subTest(latitude=latitude, longitude=longitude, radius_km=radius_km):
+						self.assertCovered(latitude, longitude, radius_km)
+
+	def test_covering_cells_at_cell_edges(self):
+		eps = 1e-9
+		for latitude, longitude in ((42.605, -5.603), (69.9, 18.9), (-33.9, 151.2)):
+			for radius_km in (0.1, 2, 30):
+				precision = geo.search_precision(latitude, radius_km)
+				min_lat, max_lat, min_lon, max_lon = geo.decode_box(geo.encode(latitude, longitude, precision))
+				for corner in ((min_lat + eps, min_lon + eps), (max_lat - eps, max_lon - eps),
+							   (min_lat + eps, max_lon - eps), (max_lat - eps, min_lon + eps)):
+					with self.subTest(corner=corner, radius_km=radius_km):
+						self.assertCovered(*corner, radius_km)
+
+	def test_whole_world_when_no_cell_fits(self):
+		self.assertEqual(geo.covering_cells(89.99, 0, 5), [""])
+		self.assertEqual(geo.covering_cells(0, 0, 20000), [""])
+		self.assertEqual(len(geo.covering_cells(0.001, 0.001, 1)), 9)
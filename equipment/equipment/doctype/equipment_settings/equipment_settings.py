@@ -1,9 +1,14 @@
 # Copyright (c) 2025, Equipment and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
+from equipment.utils.cache import clear_settings_cache
+
 
 class EquipmentSettings(Document):
-	pass
+	def on_update(self):
+		clear_settings_cache()
+		if self.reference_clause_snapshots and self.has_value_changed("reference_clause_snapshots"):
+			frappe.enqueue("equipment.utils.clauses.convert_contract_clauses", queue="long")
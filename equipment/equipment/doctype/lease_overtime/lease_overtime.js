@@ -0,0 +1,8 @@
+// Copyright (c) 2025, Equipment and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Lease Overtime', {
+	// refresh: function(frm) {
+
+	// }
+});
@@ -55,16 +55,18 @@ app_license = "MIT"
 # ----------
 
 # add methods and filters to jinja environment
-# jinja = {
-#	"methods": "equipment.utils.jinja_methods",
-#	"filters": "equipment.utils.jinja_filters"
-# }
+jinja = {
+	"methods": [
+		"equipment.utils.clauses.get_clause_text"
+	]
+}
 
 # Installation
 # ------------
 
 # before_install = "equipment.install.before_install"
-# after_install = "equipment.install.after_install"
+after_install = "equipment.install.after_install"
+after_migrate = "equipment.install.after_migrate"
 
 # Uninstallation
 # ------------
@@ -112,6 +114,30 @@ app_license = "MIT"
 doc_events = {
 	"Asset": {
 		"on_submit": "equipment.doc_events.item.rent_item"
+	},
+	"Item": {
+		"on_update": "equipment.utils.cache.clear_item_cache",
+		"on_trash": "equipment.utils.cache.clear_item_cache",
+		"after_rename": "equipment.utils.cache.clear_renamed_item_cache"
+	},
+	"User": {
+		"on_update": "equipment.utils.cache.clear_user_cache",
+		"on_trash": "equipment.utils.cache.clear_user_cache"
+	},
+	"Sales Invoice": {
+		"on_submit": "equipment.doc_events.sales_invoice.sync_payment_schedule_status",
+		"on_update_after_submit": "equipment.doc_events.sales_invoice.sync_payment_schedule_status",
+		"on_cancel": [
+			"equipment.doc_events.sales_invoice.sync_payment_schedule_status",
+			"equipment.doc_events.sales_invoice.release_overtime"
+		]
+	},
+	"Payment Entry": {
+		"on_submit": "equipment.doc_events.payment_entry.sync_payment_schedule_status",
+		"on_cancel": "equipment.doc_events.payment_entry.sync_payment_schedule_status"
+	},
+	"Journal Entry": {
+		"on_cancel": "equipment.doc_events.journal_entry.release_fuel_expense"
 	}
 }
 
@@ -128,6 +154,16 @@ scheduler_events = {
 	"hourly": [
         "equipment.api.update_payment_schedule_status"
     ],
+	"cron": {
+		# copy the latest telemetry readings to Asset
+		"*/5 * * * *": [
+			"equipment.api.telemetry.flush_asset_telemetry"
+		],
+		# last month's fuel expenses, once late telemetry batches are in
+		"0 3 2 * *": [
+			"equipment.api.fuel.post_fuel_expenses"
+		],
+	},
 	# "weekly": [
 	# 	"equipment.tasks.weekly"
 	# ],
@@ -0,0 +1,24 @@
+import frappe
+
+from equipment.doc_events.item import ensure_rent_item_group
+
+
+def after_install():
+    after_migrate()
+
+
+def after_migrate():
+    ensure_rent_item_group()
+    add_indexes()
+
+
+def add_indexes():
+    """Indexes on custom fields and composite indexes the doctype JSON cannot declare"""
+    if frappe.db.has_column("Item", "custom_asset"):
+        frappe.db.add_index("Item", ["custom_asset"])
+    if frappe.db.has_column("Timesheet", "related_lease_contract"):
+        frappe.db.add_index("Timesheet", ["related_lease_contract"])
+    # one reading per asset and time, also the index of every telemetry query
+    frappe.db.add_unique("Equipment Telemetry Reading", ["asset", "reading_time"], "asset_reading_time")
+    frappe.db.add_index("Equipment Lease Contract", ["leased_equipment", "start_date", "end_date"],
+                        "leased_equipment_period_index")
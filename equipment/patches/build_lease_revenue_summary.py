@@ -0,0 +1,5 @@
+from equipment.utils.revenue import rebuild_revenue_summary
+
+
+def execute():
+	rebuild_revenue_summary()
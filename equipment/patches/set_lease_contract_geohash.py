@@ -0,0 +1,14 @@
+import frappe
+
+from equipment.utils.geo import encode
+
+
+def execute():
+	contracts = frappe.get_all("Equipment Lease Contract",
+		filters={"geohash": ["is", "not set"]},
+		fields=["name", "latitude", "longitude"])
+
+	for contract in contracts:
+		if contract.latitude or contract.longitude:
+			frappe.db.set_value("Equipment Lease Contract", contract.name,
+				"geohash", encode(contract.latitude, contract.longitude), update_modified=False)
@@ -0,0 +1,87 @@
+"""
+Per-asset interval index of submitted lease contracts.
+
+The intervals of one asset are kept sorted by start date together with a
+running maximum of their end dates, so an overlap check is a binary search:
+a range [start, end] overlaps an existing lease iff the latest end among the
+leases starting on or before `end` is on or after `start`. The index is
+loaded with one query on (leased_equipment, start_date, end_date) and cached
+per asset until a contract of that asset is submitted or cancelled.
+"""
+from bisect import bisect_right
+
+import frappe
+from frappe.utils import getdate
+
+from equipment.utils.cache import get_cached_lookup, clear_cached_lookup
+
+
+def get_lease_intervals(asset):
+    """
+    Cached interval index of an asset
+
+    Returns:
+        dict: starts (sorted), ends, names and max_end_idx, where
+            max_end_idx[i] is the index of the latest end among intervals 0..i
+    """
+    def generator():
+        return build_interval_index(frappe.db.sql("""
+            select name, start_date, end_date
+            from `tabEquipment Lease Contract`
+            where leased_equipment = %(asset)s and docstatus = 1
+            order by start_date, end_date
+        """, {"asset": asset}, as_dict=True))
+
+    return get_cached_lookup("lease_intervals", asset, generator)
+
+
+def build_interval_index(leases):
+    """Interval index of leases (name, start_date, end_date) sorted by start date"""
+    index = {"starts": [], "ends": [], "names": [], "max_end_idx": []}
+    for i, lease in enumerate(leases):
+        index["starts"].append(getdate(lease.start_date))
+        index["ends"].append(getdate(lease.end_date))
+        index["names"].append(lease.name)
+        previous = index["max_end_idx"][-1] if i else 0
+        index["max_end_idx"].append(i if index["ends"][i] >= index["ends"][previous] else previous)
+    return index
+
+
+def find_overlapping_lease(asset, start_date, end_date, exclude=None):
+    """
+    Name of a submitted lease of `asset` overlapping [start_date, end_date], or None
+
+    Args:
+        exclude (str, optional): Contract to ignore, e.g. the one being validated
+    """
+    return find_overlap(get_lease_intervals(asset), getdate(start_date), getdate(end_date), exclude)
+
+
+def find_overlap(index, start, end, exclude=None):
+    """Name of a lease in `index` overlapping [start, end] (both inclusive), or None"""
+    position = bisect_right(index["starts"], end) - 1
+    if position < 0:
+        return None
+
+    candidate = index["max_end_idx"][position]
+    if index["ends"][candidate] < start:
+        return None
+    if index["names"][candidate] != exclude:
+        return index["names"][candidate]
+
+    # the latest ending lease is the excluded one itself, check the others
+    for i in range(position, -1, -1):
+        if index["names"][i] != exclude and index["ends"][i] >= start:
+            return index["names"][i]
+    return None
+
+
+def clear_lease_intervals(asset):
+    """
+    Forget the cached leases of an asset, now and again once the transaction commits
+
+    A concurrent availability check may reload the old intervals before the
+    commit; the second clear drops what it cached.
+    """
+    clear_cached_lookup("lease_intervals", asset)
+    frappe.db.after_commit.add(lambda: clear_cached_lookup("lease_intervals", asset))
@@ -0,0 +1,220 @@
+import frappe
+from frappe.utils import flt
+
+from equipment.utils.instrumentation import record_cache_lookup
+
+# Lookups are served from a per-request/per-job dict first, then from Redis
+# with a TTL, and only then from the database.
+LOOKUP_TTL = 6 * 60 * 60
+ITEM_PROJECTION_TTL = 60
+CACHE_PREFIX = "equipment:lookup"
+
+# Fallbacks for sites where Equipment Settings has not been filled in yet
+DEFAULT_OWNER_INCOME_ACCOUNT = "5111 - تكلفة البضاعة المباعة - ES"
+DEFAULT_COMMISSION_INCOME_ACCOUNT = "5202 - عمولة على المبيعات - ES"
+
+
+def _local_cache():
+    cache = getattr(frappe.local, "equipment_lookup_cache", None)
+    if cache is None:
+        cache = frappe.local.equipment_lookup_cache = {}
+    return cache
+
+
+def get_cached_lookup(namespace, key, generator, ttl=LOOKUP_TTL):
+    """
+    Return a lookup value from the request cache, Redis or `generator`
+
+    Args:
+        namespace (str): Lookup family, used for invalidation
+        key (str): Lookup key inside the namespace
+        generator (callable): Called without arguments on a cache miss
+        ttl (int, optional): Redis expiry in seconds
+
+    Returns:
+        The cached or freshly generated value
+    """
+    cache_key = f"{CACHE_PREFIX}:{namespace}:{key}"
+    local_cache = _local_cache()
+    if cache_key in local_cache:
+        record_cache_lookup(hit=True)
+        return local_cache[cache_key]
+
+    value = frappe.cache().get_value(cache_key)
+    record_cache_lookup(hit=value is not None)
+    if value is None:
+        value = generator()
+        if value is not None:
+            frappe.cache().set_value(cache_key, value, expires_in_sec=ttl)
+
+    local_cache[cache_key] = value
+    return value
+
+
+def clear_cached_lookup(namespace, key=None):
+    """Drop one key, or the whole namespace when `key` is omitted"""
+    prefix = f"{CACHE_PREFIX}:{namespace}:"
+    local_cache = _local_cache()
+    if key is None:
+        frappe.cache().delete_keys(prefix)
+        for cache_key in [k for k in local_cache if k.startswith(prefix)]:
+            local_cache.pop(cache_key, None)
+    else:
+        frappe.cache().delete_value(prefix + key)
+        local_cache.pop(prefix + key, None)
+
+
+def get_item_name(item_code):
+    return get_cached_lookup(
+        "item_name", item_code,
+        lambda: frappe.db.get_value("Item", item_code, "item_name") or item_code
+    )
+
+
+def _item_projection_keys(item_code):
+    # raw Redis set of the projection cache keys of an item; item codes can hold
+    # glob characters, so projections are never cleared by a key pattern
+    return frappe.cache().make_key(f"{CACHE_PREFIX}:item_projection_keys:{item_code}")
+
+
+def get_item_projection(item_code, fields, ttl=ITEM_PROJECTION_TTL):
+    """
+    Selected fields of an Item with a primary key lookup, or None if it does not exist
+
+    Args:
+        item_code (str): Item name
+        fields (tuple): Item fields to return
+        ttl (int, optional): Redis expiry in seconds, kept short for guest endpoints
+    """
+    key = f"{item_code}|{','.join(fields)}"
+
+    def generator():
+        pipeline = frappe.cache().pipeline()
+        pipeline.sadd(_item_projection_keys(item_code), key)
+        pipeline.expire(_item_projection_keys(item_code), max(ttl, LOOKUP_TTL))
+        pipeline.execute()
+        return frappe.db.get_value("Item", item_code, list(fields), as_dict=True)
+
+    return get_cached_lookup("item_projection", key, generator, ttl=ttl)
+
+
+def clear_item_projections(item_code):
+    """Drop exactly the cached projections of one item"""
+    keys_key = _item_projection_keys(item_code)
+    pipeline = frappe.cache().pipeline()
+    pipeline.smembers(keys_key)
+    pipeline.delete(keys_key)
+    keys = {frappe.safe_decode(key) for key in pipeline.execute()[0]}
+    # projections read in this request may not have reached Redis yet
+    prefix = f"{CACHE_PREFIX}:item_projection:{item_code}|"
+    keys.update(k[len(f"{CACHE_PREFIX}:item_projection:"):] for k in _local_cache() if k.startswith(prefix))
+    for key in keys:
+        clear_cached_lookup("item_projection", key)
+
+
+def get_invoice_accounts():
+    """
+    Income accounts used on rent invoices, resolved from Equipment Settings
+
+    Returns:
+        dict: owner_income_account, commission_income_account
+    """
+    def generator():
+        settings = frappe.db.get_singles_dict("Equipment Settings")
+        return {
+            "owner_income_account": settings.get("liability_to_lessor_account") or DEFAULT_OWNER_INCOME_ACCOUNT,
+            "commission_income_account": settings.get("platform_commission_income_account") or DEFAULT_COMMISSION_INCOME_ACCOUNT,
+        }
+
+    return get_cached_lookup("settings", "invoice_accounts", generator)
+
+
+def get_fuel_expense_settings():
+    """
+    Accounts and fuel price used to post lease fuel expenses, from Equipment Settings
+
+    Returns:
+        dict: fuel_expense_account, lessor_account, fuel_price
+    """
+    def generator():
+        settings = frappe.db.get_singles_dict("Equipment Settings")
+        return {
+            "fuel_expense_account": settings.get("default_fuel_expense_account"),
+            "lessor_account": settings.get("liability_to_lessor_account"),
+            "fuel_price": flt(settings.get("fuel_price")),
+        }
+
+    return get_cached_lookup("settings", "fuel_expense", generator)
+
+
+def get_default_company():
+    """Default company of the session user, falling back to the global default"""
+    # user defaults differ per user, so is the cache key
+    return get_cached_lookup(
+        "company", f"default:{frappe.session.user}",
+        lambda: frappe.defaults.get_user_default("Company")
+        or frappe.db.get_single_value("Global Defaults", "default_company")
+    )
+
+
+def clear_item_cache(doc, method=None):
+    """Item doc_event: forget the cached name and projections of the saved / deleted item"""
+    clear_cached_lookup("item_name", doc.name)
+    clear_item_projections(doc.name)
+
+
+def clear_renamed_item_cache(doc, method=None, old=None, new=None, merge=False):
+    """Item after_rename doc_event: forget what is cached under the old and the new name"""
+    for item_code in filter(None, {old, new}):
+        clear_cached_lookup("item_name", item_code)
+        clear_item_projections(item_code)
+
+
+def clear_settings_cache():
+    clear_cached_lookup("settings")
+    clear_cached_lookup("company")
+
+
+def _login_key(login):
+    return (login or "").strip().lower()
+
+
+def get_user_profile(login):
+    """
+    Login profile of a user found by name or email, or None
+
+    One query served by the primary key and the unique email index, plus the
+    roles. Cached per login, case-insensitively like the login itself, until
+    the User (or its roles, saved with it) changes.
+
+    Returns:
+        dict: name, enabled, full_name, email, user_type, api_key and roles
+    """
+    login = _login_key(login)
+
+    def generator():
+        profile = frappe.db.sql("""
+            select name, enabled, full_name, email, user_type, api_key
+            from `tabUser`
+            where name = %(login)s or email = %(login)s
+            order by name = %(login)s desc
+            limit 1
+        """, {"login": login}, as_dict=True)
+        if not profile:
+            return None
+        profile = profile[0]
+        profile["roles"] = frappe.get_roles(profile.name)
+        return profile
+
+    return get_cached_lookup("user_profile", login, generator)
+
+
+def clear_user_cache(doc, method=None):
+    """User doc_event: forget the cached login profile of the user, roles are saved with it"""
+    logins = {doc.name, doc.get("email")}
+    get_previous = getattr(doc, "get_doc_before_save", None)
+    previous = get_previous() if callable(get_previous) else None
+    if previous:
+        logins.add(previous.get("email"))
+    for login in filter(None, map(_login_key, logins)):
+        clear_cached_lookup("user_profile", login)
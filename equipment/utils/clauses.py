@@ -0,0 +1,116 @@
+"""
+Content-addressed clause text for lease contracts.
+
+With "Reference Clause Snapshots" enabled in Equipment Settings, a contract
+stores a link to an immutable Clause Snapshot (named by the SHA-256 of the
+text) instead of its own copy of each clause. Contracts using the same
+template version share one snapshot row. Snapshot text never changes, so it
+is cached without invalidation for rendering.
+"""
+import hashlib
+
+import frappe
+from frappe.utils import cint
+
+from equipment.utils.cache import get_cached_lookup, clear_cached_lookup
+
+SNAPSHOT_DOCTYPE = "Clause Snapshot"
+SNAPSHOT_TTL = 7 * 24 * 60 * 60
+
+# (contract text field, template link field, template doctype, snapshot link field)
+CLAUSE_FIELDS = (
+    ("maintenance_terms", "maintenance_terms_template", "Maintenance Terms Template", "maintenance_terms_snapshot"),
+    ("insurance_clauses", "insurance_clauses_template", "Insurance Clauses Template", "insurance_clauses_snapshot"),
+    ("early_termination_clauses", "early_termination_clauses_template",
+     "Early Termination Clauses Template", "early_termination_clauses_snapshot"),
+    ("late_payment_penalties", "late_payment_penalties_template",
+     "Late Payment Penalties Template", "late_payment_penalties_snapshot"),
+)
+
+
+def reference_clause_snapshots():
+    return cint(frappe.get_cached_doc("Equipment Settings").get("reference_clause_snapshots"))
+
+
+def get_content_hash(text):
+    return hashlib.sha256((text or "").strip().encode()).hexdigest()
+
+
+def get_clause_text(snapshot):
+    """Text of a Clause Snapshot, also available to print formats as a Jinja method"""
+    if not snapshot:
+        return ""
+    return get_cached_lookup(
+        "clause_snapshot", snapshot,
+        lambda: frappe.db.get_value(SNAPSHOT_DOCTYPE, snapshot, "terms"),
+        ttl=SNAPSHOT_TTL,
+    ) or ""
+
+
+def get_snapshot(text, template_doctype=None, template=None):
+    """
+    Name of the snapshot holding `text`, created on first use
+
+    Returns:
+        str: The content hash, which is also the snapshot name
+    """
+    content_hash = get_content_hash(text)
+    if get_clause_text(content_hash):
+        return content_hash
+
+    version = frappe.db.count(SNAPSHOT_DOCTYPE, {"template_doctype": template_doctype, "template": template}) + 1 \
+        if template else 1
+    try:
+        frappe.get_doc({
+            "doctype": SNAPSHOT_DOCTYPE,
+            "content_hash": content_hash,
+            "terms": text.strip(),
+            "template_doctype": template_doctype if template else None,
+            "template": template,
+            "version": version,
+        }).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # created by a concurrent save
+        pass
+    # drop the miss remembered by the lookup above
+    clear_cached_lookup("clause_snapshot", content_hash)
+    return content_hash
+
+
+def get_template_snapshot(template_doctype, template):
+    """Snapshot of the current text of a clause template (copy-on-select)"""
+    text = frappe.db.get_value(template_doctype, template, "terms")
+    return get_snapshot(text, template_doctype, template) if text else None
+
+
+def convert_contract_clauses():
+    """
+    Move the clause text already stored on contracts into snapshots
+
+    One snapshot per distinct text, then one UPDATE per snapshot links the
+    contracts and clears their copy, including submitted contracts.
+
+    Returns:
+        int: Number of clause fields converted
+    """
+    converted = 0
+    for text_field, template_field, template_doctype, snapshot_field in CLAUSE_FIELDS:
+        contents = frappe.db.sql(f"""
+            select md5(`{text_field}`) as text_md5, max(`{text_field}`) as text, max(`{template_field}`) as template
+            from `tabEquipment Lease Contract`
+            where ifnull(`{text_field}`, '') != ''
+            group by md5(`{text_field}`)
+        """, as_dict=True)
+
+        for content in contents:
+            snapshot = get_snapshot(content.text, template_doctype, content.template)
+            frappe.db.sql(f"""
+                update `tabEquipment Lease Contract`
+                set `{snapshot_field}` = %(snapshot)s, `{text_field}` = null
+                where md5(`{text_field}`) = %(text_md5)s
+            """, {"snapshot": snapshot, "text_md5": content.text_md5})
+            converted += frappe.db._cursor.rowcount
+        frappe.db.commit()
+
+    frappe.logger().info(f"Contract clauses moved to snapshots: {converted} fields")
+    return converted
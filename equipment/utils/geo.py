@@ -0,0 +1,118 @@
+"""
+Geohash encoding and distance helpers for the lease work location search.
+
+A geohash prefix is a lat/long bounding box, so "within R km" becomes a few
+indexed `geohash like 'prefix%'` range scans (the cell around the point and
+its 8 neighbours, at a precision whose cells are at least R wide) followed
+by an exact haversine filter on the few candidates.
+"""
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+MAX_SEARCH_PRECISION = 8
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        value_range, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(geohash)
+
+
+def decode_box(geohash):
+    """(min_lat, max_lat, min_lon, max_lon) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def cell_size_degrees(precision):
+    """(width, height) in degrees of the cells of a precision"""
+    bits = 5 * precision
+    return 360.0 / 2 ** ((bits + 1) // 2), 180.0 / 2 ** (bits // 2)
+
+
+def radius_extent_degrees(latitude, radius_km):
+    """
+    (longitude, latitude) half-extent in degrees of the circle of `radius_km`
+
+    The longitude extent is taken where the circle is widest in degrees, so it
+    holds for the whole circle and not only at its centre. None when the
+    circle reaches a pole and so spans every longitude.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    cos_lat = math.cos(math.radians(latitude))
+    if angle >= math.pi / 2 - math.radians(abs(latitude)) or cos_lat <= 0:
+        return None
+    return math.degrees(math.asin(min(math.sin(angle) / cos_lat, 1.0))), math.degrees(angle)
+
+
+def search_precision(latitude, radius_km):
+    """
+    Finest precision whose cells are at least as wide and high as the radius around this latitude
+
+    0 when even the top-level cells are too small (huge radius or a circle
+    around a pole): the search then has to cover the whole world.
+    """
+    extent = radius_extent_degrees(latitude, radius_km)
+    if extent is None:
+        return 0
+    precision = 0
+    for candidate in range(1, MAX_SEARCH_PRECISION + 1):
+        width, height = cell_size_degrees(candidate)
+        if width >= extent[0] and height >= extent[1]:
+            precision = candidate
+    return precision
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Geohash prefixes (the cell of the point and its neighbours) covering the radius"""
+    precision = search_precision(latitude, radius_km)
+    if not precision:
+        # the empty prefix matches every geohash
+        return [""]
+    min_lat, max_lat, min_lon, max_lon = decode_box(encode(latitude, longitude, precision))
+    center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    lat_step, lon_step = max_lat - min_lat, max_lon - min_lon
+
+    cells = set()
+    for dy in (-1, 0, 1):
+        lat = center_lat + dy * lat_step
+        if not -90 <= lat <= 90:
+            continue
+        for dx in (-1, 0, 1):
+            lon = (center_lon + dx * lon_step + 180) % 360 - 180
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
@@ -0,0 +1,141 @@
+"""
+Per-call metrics for the equipment API and scheduler entry points.
+
+Wrap an entry point with `@instrument()` (below `@frappe.whitelist()`) to
+record its duration, DB query count and time, rows touched and lookup
+cache hits/misses. Every call is logged as one JSON line to
+`logs/equipment_metrics.log` and added to running totals in Redis, which
+`equipment.api.metrics.get_metrics` serves in the Prometheus text format.
+"""
+import json
+import time
+from functools import wraps
+
+import frappe
+
+METRICS_CACHE_KEY = "equipment:metrics"
+COUNTERS = ("calls", "errors", "seconds", "queries", "query_seconds", "rows", "cache_hits", "cache_misses")
+
+
+def _active_frames():
+    frames = getattr(frappe.local, "equipment_metric_frames", None)
+    if frames is None:
+        frames = frappe.local.equipment_metric_frames = []
+    return frames
+
+
+def _install_sql_probe():
+    """Time every frappe.db.sql call while at least one instrumented call is running"""
+    db = getattr(frappe.local, "db", None)
+    if db is None or "sql" in db.__dict__:
+        return
+
+    original_sql = db.sql
+
+    def sql(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original_sql(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            rowcount = max(getattr(getattr(db, "_cursor", None), "rowcount", 0) or 0, 0)
+            for frame in _active_frames():
+                frame["queries"] += 1
+                frame["query_seconds"] += elapsed
+                frame["rows"] += rowcount
+
+    sql.equipment_sql_probe = True
+    db.sql = sql
+
+
+def _remove_sql_probe():
+    # leave sql wrappers installed by others (e.g. the benchmark's query counter) alone
+    db = getattr(frappe.local, "db", None)
+    if db is not None and getattr(db.__dict__.get("sql"), "equipment_sql_probe", False):
+        del db.sql
+
+
+def record_cache_lookup(hit):
+    """Count a lookup cache hit or miss against every running instrumented call"""
+    for frame in _active_frames():
+        frame["cache_hits" if hit else "cache_misses"] += 1
+
+
+def instrument(name=None, label=None):
+    """
+    Decorator recording per-call metrics of an entry point
+
+    Args:
+        name (str, optional): Metric name, defaults to the dotted path of the function
+        label (str, optional): Keyword argument whose value is added to the log line,
+            e.g. "contract", to see which records dominate load
+    """
+    def decorator(fn):
+        metric = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            frames = _active_frames()
+            frame = dict.fromkeys(COUNTERS, 0)
+            frame["calls"] = 1
+            if not frames:
+                _install_sql_probe()
+            frames.append(frame)
+
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                frame["errors"] = 1
+                raise
+            finally:
+                frame["seconds"] = time.perf_counter() - started
+                frames.remove(frame)
+                if not frames:
+                    _remove_sql_probe()
+                publish(metric, frame, kwargs.get(label) if label else None)
+
+        return wrapper
+    return decorator
+
+
+def publish(metric, frame, label_value=None):
+    """Write one call as a structured log line and add it to the Redis totals"""
+    try:
+        record = {"metric": metric, **{k: round(v, 6) for k, v in frame.items()}}
+        if label_value is not None:
+            record["label"] = str(label_value)
+        frappe.logger("equipment_metrics").info(json.dumps(record))
+
+        cache = frappe.cache()
+        key = cache.make_key(METRICS_CACHE_KEY)
+        pipeline = cache.pipeline()
+        for counter, value in frame.items():
+            if value:
+                pipeline.hincrbyfloat(key, f"{counter}|{metric}", value)
+        pipeline.execute()
+    except Exception:
+        # metrics must never break the instrumented call
+        pass
+
+
+def get_metric_totals():
+    """
+    Running totals recorded since the last reset
+
+    Returns:
+        dict: metric name -> {counter: value}
+    """
+    cache = frappe.cache()
+    # read through a raw pipeline, frappe's hgetall expects pickled values
+    pipeline = cache.pipeline()
+    pipeline.hgetall(cache.make_key(METRICS_CACHE_KEY))
+    totals = {}
+    for field, value in (pipeline.execute()[0] or {}).items():
+        counter, metric = frappe.safe_decode(field).split("|", 1)
+        totals.setdefault(metric, dict.fromkeys(COUNTERS, 0))[counter] = float(value)
+    return totals
+
+
+def reset_metrics():
+    frappe.cache().delete(frappe.cache().make_key(METRICS_CACHE_KEY))
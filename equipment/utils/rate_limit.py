@@ -0,0 +1,201 @@
+"""
+Token-bucket rate limiting and failed-login lockout for guest endpoints.
+
+Wrap a whitelisted method with `@rate_limit("bucket")` (directly below
+`@frappe.whitelist()`). Every request takes a token from a per-IP bucket and,
+with `key_arg`, from a bucket of that argument (e.g. the username). Buckets
+live in Redis and are refilled and drawn in one Lua script, so parallel
+workers share them. When Redis is unreachable an in-process stand-in is used.
+Rejected calls raise TooManyRequestsError (HTTP 429) before the endpoint
+touches the database or hashes a password.
+
+Limits can be overridden per bucket in site config:
+    "equipment_rate_limits": {"login": {"rate": 0.2, "capacity": 10}}
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+import frappe
+from redis.exceptions import RedisError
+
+from equipment.utils.cache import get_user_profile
+
+RATE_LIMIT_PREFIX = "equipment:rate_limit"
+
+# bucket -> tokens refilled per second and burst capacity
+DEFAULT_LIMITS = {
+    "login": {"rate": 5 / 60, "capacity": 10},
+    "guest": {"rate": 10, "capacity": 50},
+}
+
+# failed logins allowed per window before the account is locked out
+LOCKOUT_THRESHOLD = 5
+LOCKOUT_WINDOW = 15 * 60
+LOCKOUT_DURATION = 15 * 60
+
+TOKEN_BUCKET_SCRIPT = """
+local rate, capacity, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+# stand-in for Redis: key -> [tokens, ts]; only shared within one process
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+def get_limits(bucket):
+    limits = dict(DEFAULT_LIMITS.get(bucket) or DEFAULT_LIMITS["guest"])
+    limits.update((frappe.conf.get("equipment_rate_limits") or {}).get(bucket) or {})
+    return float(limits["rate"]), float(limits["capacity"])
+
+
+def _take_token_locally(key, rate, capacity, now):
+    with _local_lock:
+        tokens, ts = _local_buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(now - ts, 0) * rate)
+        allowed = tokens >= 1
+        _local_buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return allowed, tokens
+
+
+def take_token(bucket, key):
+    """
+    Draw one token from the bucket of `key`
+
+    Returns:
+        tuple: (allowed, seconds until the next token is available)
+    """
+    rate, capacity = get_limits(bucket)
+    cache_key = f"{RATE_LIMIT_PREFIX}:{bucket}:{key}"
+    now = time.time()
+    try:
+        cache = frappe.cache()
+        allowed, tokens = cache.eval(TOKEN_BUCKET_SCRIPT, 1, cache.make_key(cache_key), rate, capacity, now)
+        allowed, tokens = bool(allowed), float(tokens)
+    except RedisError:
+        allowed, tokens = _take_token_locally(cache_key, rate, capacity, now)
+
+    retry_after = 0 if allowed else math.ceil((1 - tokens) / rate)
+    return allowed, retry_after
+
+
+def get_lockout_user(login):
+    """
+    The account a login (name or email, any case) belongs to, lowercased
+
+    Lockouts are per account, so every spelling of it shares one counter.
+    None for unknown logins: they only draw from the per-IP bucket and
+    create no lockout keys.
+    """
+    profile = get_user_profile(login) if login else None
+    return profile.name.lower() if profile else None
+
+
+def _lockout_key(user):
+    return frappe.cache().make_key(f"{RATE_LIMIT_PREFIX}:lockout:{user}")
+
+
+def _failures_key(user):
+    return frappe.cache().make_key(f"{RATE_LIMIT_PREFIX}:failures:{user}")
+
+
+def get_lockout_ttl(username):
+    """Seconds left on the lockout of the account of `username`, 0 when it is not locked"""
+    username = get_lockout_user(username)
+    if not username:
+        return 0
+    try:
+        return max(frappe.cache().ttl(_lockout_key(username)) or 0, 0)
+    except RedisError:
+        return 0
+
+
+def register_failed_login(username):
+    """Count a failed login and lock the account out once LOCKOUT_THRESHOLD is reached"""
+    username = get_lockout_user(username)
+    if not username:
+        return
+    try:
+        failures = frappe.cache().pipeline().incr(_failures_key(username)).execute()[0]
+        if failures == 1:
+            # the window starts with the first failure
+            frappe.cache().expire(_failures_key(username), LOCKOUT_WINDOW)
+        if failures >= LOCKOUT_THRESHOLD:
+            pipeline = frappe.cache().pipeline()
+            pipeline.set(_lockout_key(username), 1, ex=LOCKOUT_DURATION)
+            pipeline.delete(_failures_key(username))
+            pipeline.execute()
+    except RedisError:
+        pass
+
+
+def clear_failed_logins(username):
+    username = get_lockout_user(username)
+    if not username:
+        return
+    try:
+        frappe.cache().delete(_failures_key(username))
+    except RedisError:
+        pass
+
+
+def reject(retry_after, message=None):
+    frappe.throw(
+        message or f"Too many requests, retry in {retry_after} seconds",
+        frappe.TooManyRequestsError,
+        title="Rate Limited",
+    )
+
+
+def rate_limit(bucket="guest", key_arg=None, lockout=False):
+    """
+    Decorator applying the token buckets (and optionally the login lockout) to an endpoint
+
+    Only the outermost limited call of an HTTP request is checked, so
+    endpoints calling each other internally and background jobs are not
+    throttled.
+
+    Args:
+        bucket (str): Limits to apply, a key of DEFAULT_LIMITS / equipment_rate_limits
+        key_arg (str, optional): Argument with its own bucket besides the client IP, e.g. "username"
+        lockout (bool, optional): Refuse calls while the `key_arg` value is locked out
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not getattr(frappe.local, "request", None) or getattr(frappe.local, "equipment_rate_limited", False):
+                return fn(*args, **kwargs)
+
+            frappe.local.equipment_rate_limited = True
+            try:
+                key = kwargs.get(key_arg) if key_arg else None
+                if lockout and key:
+                    locked_for = get_lockout_ttl(key)
+                    if locked_for:
+                        reject(locked_for, f"Too many failed logins, retry in {locked_for} seconds")
+
+                allowed, retry_after = take_token(bucket, f"ip:{frappe.local.request_ip}")
+                if allowed and key:
+                    allowed, retry_after = take_token(bucket, f"{key_arg}:{str(key).lower()}")
+                if not allowed:
+                    reject(retry_after)
+
+                return fn(*args, **kwargs)
+            finally:
+                frappe.local.equipment_rate_limited = False
+
+        return wrapper
+    return decorator
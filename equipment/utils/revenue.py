@@ -0,0 +1,181 @@
+"""
+Incremental maintenance of the Lease Revenue Summary aggregate table.
+
+One summary row per (month, lessor, lessee, asset, platform). Its name is
+the md5 of that key, so MariaDB `insert .. on duplicate key update` on the
+primary key folds a change into the existing row without reading it first.
+
+- Scheduled amounts (lease, owner, commission) are added when a contract is
+  submitted and subtracted when it is cancelled. Amending is a cancel of the
+  old contract plus a submit of the new one. They come from the billing rule,
+  so compact schedules are counted in full.
+- Invoiced and paid amounts are recomputed from the schedule rows for the
+  (lessor, lessee, asset, platform) combinations of the changed contracts
+  whenever rows are invoiced or their invoice status changes.
+"""
+import hashlib
+
+import frappe
+from frappe.utils import getdate, now_datetime
+
+from equipment.utils import schedule
+
+SUMMARY_DOCTYPE = "Lease Revenue Summary"
+SCHEDULED_FIELDS = ("lease_amount", "owner_amount", "platform_commission_amount")
+KEY_FIELDS = ("lessor", "lessee", "leased_equipment", "platform")
+
+# same key as get_summary_name(), for summary rows built in SQL
+SQL_SUMMARY_NAME = """md5(concat_ws('|', {period}, ifnull({table}.lessor, ''), ifnull({table}.lessee, ''),
+    ifnull({table}.leased_equipment, ''), ifnull({table}.platform, '')))"""
+
+
+def get_period(due_date):
+    """Summary period (first day of the month) of a due date"""
+    return getdate(due_date).replace(day=1)
+
+
+def get_summary_name(period, lessor, lessee, leased_equipment, platform):
+    key = "|".join([str(period), lessor or "", lessee or "", leased_equipment or "", platform or ""])
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def apply_contract(contract, sign=1):
+    """
+    Add (sign=1) or subtract (sign=-1) the scheduled amounts of a contract
+
+    Args:
+        contract: Equipment Lease Contract document or dict with its terms
+
+    Rows emptied by a cancel are not deleted here: the caller refreshes the
+    billed amounts first and then passes the names to delete_empty_rows().
+
+    Returns:
+        list: Names of the summary rows touched
+    """
+    months = {}
+    for period in schedule.build_schedule(
+        contract.get("start_date"), contract.get("end_date"), contract.get("billing_cycle"),
+        contract.get("lease_amount"), contract.get("platform_commission_percentage")
+    ):
+        totals = months.setdefault(get_period(period["due_date"]), dict.fromkeys(SCHEDULED_FIELDS, 0))
+        totals["lease_amount"] += period["amount"] * sign
+        totals["owner_amount"] += period["owner_amount"] * sign
+        totals["platform_commission_amount"] += period["platform_commission_amount"] * sign
+
+    if not months:
+        return []
+
+    now, user = now_datetime(), frappe.session.user
+    key = [contract.get(field) for field in KEY_FIELDS]
+    values = [
+        (get_summary_name(period, *key), now, now, user, user, period, *key,
+         totals["lease_amount"], totals["owner_amount"], totals["platform_commission_amount"])
+        for period, totals in sorted(months.items())
+    ]
+    frappe.db.sql(f"""
+        insert into `tab{SUMMARY_DOCTYPE}`
+            (name, creation, modified, owner, modified_by, period,
+             lessor, lessee, leased_equipment, platform,
+             lease_amount, owner_amount, platform_commission_amount)
+        values {", ".join(["%s"] * len(values))}
+        on duplicate key update
+            lease_amount = lease_amount + values(lease_amount),
+            owner_amount = owner_amount + values(owner_amount),
+            platform_commission_amount = platform_commission_amount + values(platform_commission_amount),
+            modified = values(modified)
+    """, tuple(values))
+    return [row[0] for row in values]
+
+
+def refresh_billed_amounts(contracts=None):
+    """
+    Recompute invoiced and paid amounts from the payment schedule rows
+
+    Only the (lessor, lessee, asset, platform) combinations of `contracts` are
+    rebuilt, in two set-based statements; all of them when `contracts` is None.
+    Invoiced counts every row linked to a non-cancelled invoice, paid every
+    row whose invoice is fully paid.
+    """
+    contracts = tuple(sorted(set(filter(None, contracts or ())))) if contracts is not None else None
+    if contracts == ():
+        return
+
+    key_filter = ""
+    if contracts:
+        key_filter = f"""
+            inner join (
+                select distinct {", ".join(f"ifnull({field}, '') as {field}" for field in KEY_FIELDS)}
+                from `tabEquipment Lease Contract`
+                where name in %(contracts)s
+            ) changed on {" and ".join(f"ifnull({{table}}.{field}, '') = changed.{field}" for field in KEY_FIELDS)}
+        """
+
+    frappe.db.sql(f"""
+        update `tab{SUMMARY_DOCTYPE}` summary
+        {key_filter.format(table="summary")}
+        set summary.invoiced_amount = 0, summary.paid_amount = 0
+    """, {"contracts": contracts})
+
+    frappe.db.sql(f"""
+        insert into `tab{SUMMARY_DOCTYPE}`
+            (name, creation, modified, owner, modified_by, period,
+             lessor, lessee, leased_equipment, platform, invoiced_amount, paid_amount)
+        select
+            {SQL_SUMMARY_NAME.format(period="billed.period", table="billed")},
+            %(now)s, %(now)s, %(user)s, %(user)s, billed.period,
+            billed.lessor, billed.lessee, billed.leased_equipment, billed.platform,
+            billed.invoiced_amount, billed.paid_amount
+        from (
+            select
+                date_format(detail.due_date, '%%Y-%%m-01') as period,
+                contract.lessor, contract.lessee, contract.leased_equipment, contract.platform,
+                sum(detail.amount) as invoiced_amount,
+                sum(if(detail.status = 'Paid', detail.amount, 0)) as paid_amount
+            from `tabEquipment Lease Contract Detail` detail
+            inner join `tabEquipment Lease Contract` contract
+                on contract.name = detail.parent
+            {key_filter.format(table="contract")}
+            where detail.parenttype = 'Equipment Lease Contract'
+                and detail.parentfield = 'payment_schedule_table'
+                and ifnull(detail.invoice, '') != ''
+                and ifnull(detail.status, '') != 'Cancelled'
+                and contract.docstatus = 1
+            group by period, contract.lessor, contract.lessee, contract.leased_equipment, contract.platform
+        ) billed
+        on duplicate key update
+            invoiced_amount = values(invoiced_amount),
+            paid_amount = values(paid_amount),
+            modified = values(modified)
+    """, {"contracts": contracts, "now": now_datetime(), "user": frappe.session.user})
+
+
+def delete_empty_rows(names):
+    """Drop summary rows left without any amount, e.g. after a contract is cancelled"""
+    if names:
+        frappe.db.sql(f"""
+            delete from `tab{SUMMARY_DOCTYPE}`
+            where name in %(names)s
+                and lease_amount = 0 and owner_amount = 0 and platform_commission_amount = 0
+                and invoiced_amount = 0 and paid_amount = 0
+        """, {"names": tuple(names)})
+
+
+def rebuild_revenue_summary():
+    """
+    Rebuild the whole table from the submitted contracts
+
+    Used to backfill existing contracts and to repair the table; the
+    incremental updates keep it current afterwards.
+
+    Returns:
+        int: Number of contracts summarized
+    """
+    frappe.db.delete(SUMMARY_DOCTYPE)
+    contracts = frappe.get_all("Equipment Lease Contract", filters={"docstatus": 1}, fields=[
+        "name", "start_date", "end_date", "billing_cycle", "lease_amount",
+        "platform_commission_percentage", *KEY_FIELDS
+    ])
+    for contract in contracts:
+        apply_contract(contract)
+    refresh_billed_amounts()
+    return len(contracts)
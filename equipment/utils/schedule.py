@@ -0,0 +1,154 @@
+"""
+Billing period arithmetic shared by the lease contract, the scheduler jobs
+and the contract form.
+
+Due dates are computed in closed form from the period index (start + k
+periods) rather than by stepping from one due date to the next, so a whole
+schedule is produced in a single pass and month ends do not drift
+(Jan 31 -> Feb 28 -> Mar 31).
+"""
+import calendar
+from datetime import timedelta
+
+from frappe.utils import flt, getdate
+
+BILLING_CYCLES = ("Daily", "Weekly", "Monthly", "Yearly")
+
+# contract field holding the number of periods for each billing cycle
+DURATION_FIELDS = {
+    "Daily": "contract_duration_days",
+    "Weekly": "contract_duration_weeks",
+    "Monthly": "contract_duration_months",
+    "Yearly": "contract_duration_years",
+}
+
+
+def shift_months(start, months):
+    """`start` moved by `months`, clamping the day to the end of the target month"""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    month += 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def count_periods(start_date, end_date, billing_cycle):
+    """Number of billing periods starting between `start_date` and `end_date` inclusive"""
+    start, end = getdate(start_date), getdate(end_date)
+    if end < start or billing_cycle not in BILLING_CYCLES:
+        return 0
+
+    days = (end - start).days + 1
+    if billing_cycle == "Daily":
+        return days
+    if billing_cycle == "Weekly":
+        return (days - 1) // 7 + 1
+
+    step = 12 if billing_cycle == "Yearly" else 1
+    months = (end.year - start.year) * 12 + (end.month - start.month)
+    periods = months // step
+    if shift_months(start, periods * step) > end:
+        periods -= 1
+    return periods + 1
+
+
+def get_due_date(start, billing_cycle, period):
+    """Due date of the billing period with index `period` (0 is the first)"""
+    if billing_cycle == "Daily":
+        return start + timedelta(days=period)
+    if billing_cycle == "Weekly":
+        return start + timedelta(weeks=period)
+    return shift_months(start, period * (12 if billing_cycle == "Yearly" else 1))
+
+
+def get_due_dates(start_date, end_date, billing_cycle, first_period=0, last_period=None):
+    """
+    Due dates of the billing periods `first_period` .. `last_period` (exclusive)
+
+    Args:
+        start_date, end_date: Contract range
+        billing_cycle (str): One of BILLING_CYCLES
+        first_period (int, optional): Index of the first period to return
+        last_period (int, optional): Index after the last period, defaults to all
+
+    Returns:
+        list: datetime.date objects in ascending order
+    """
+    start = getdate(start_date)
+    periods = count_periods(start, end_date, billing_cycle)
+    last_period = periods if last_period is None else min(last_period, periods)
+    indexes = range(first_period, last_period)
+
+    if billing_cycle == "Daily":
+        return [start + timedelta(days=k) for k in indexes]
+    if billing_cycle == "Weekly":
+        return [start + timedelta(weeks=k) for k in indexes]
+    step = 12 if billing_cycle == "Yearly" else 1
+    return [shift_months(start, k * step) for k in indexes]
+
+
+def get_period_amounts(lease_amount, commission_percent):
+    """Amount split of one billing period"""
+    lease_amount = flt(lease_amount)
+    commission = lease_amount * flt(commission_percent) / 100
+    return {
+        "amount": lease_amount,
+        "platform_commission_amount": commission,
+        "owner_amount": lease_amount - commission,
+    }
+
+
+def build_schedule(start_date, end_date, billing_cycle, lease_amount, commission_percent,
+                   first_period=0, last_period=None):
+    """
+    Billing periods of a contract as {due_date, amount, platform_commission_amount, owner_amount}
+
+    `first_period` and `last_period` restrict the result the same way as in
+    get_due_dates(); by default every period is returned.
+    """
+    amounts = get_period_amounts(lease_amount, commission_percent)
+    return [
+        dict(amounts, due_date=due_date)
+        for due_date in get_due_dates(start_date, end_date, billing_cycle, first_period, last_period)
+    ]
+
+
+def iter_schedule(start_date, end_date, billing_cycle, lease_amount, commission_percent, first_period=0):
+    """
+    Lazily yield the billing periods from `first_period` on
+
+    Nothing is materialized, so previews and reports can walk far into long
+    daily contracts and stop whenever they have enough periods.
+    """
+    start, end = getdate(start_date), getdate(end_date)
+    if billing_cycle not in BILLING_CYCLES:
+        return
+
+    amounts = get_period_amounts(lease_amount, commission_percent)
+    period = first_period
+    while (due_date := get_due_date(start, billing_cycle, period)) <= end:
+        yield dict(amounts, due_date=due_date)
+        period += 1
+
+
+def get_schedule_summary(start_date, end_date, billing_cycle, lease_amount, commission_percent):
+    """
+    Period count, duration fields and totals of a contract
+
+    A contract without a complete date range or a known billing cycle counts
+    as a single period.
+    """
+    if start_date and end_date and billing_cycle in BILLING_CYCLES:
+        periods = count_periods(start_date, end_date, billing_cycle)
+    else:
+        periods = 1
+
+    amounts = get_period_amounts(lease_amount, commission_percent)
+    summary = {
+        "periods": periods,
+        "total_lease_amount": amounts["amount"] * periods,
+        "total_platform_commission_amount": amounts["platform_commission_amount"] * periods,
+        "total_owner_amount": amounts["owner_amount"] * periods,
+    }
+    for cycle, fieldname in DURATION_FIELDS.items():
+        summary[fieldname] = periods if cycle == billing_cycle else ""
+    return summary